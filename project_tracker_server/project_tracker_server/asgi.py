@@ -3,14 +3,59 @@ ASGI config for project_tracker_server project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests are resolved against rest_api.async_urls, which serves task and
+project reads from async views and falls back to the regular URLconf.
+Server push (SSE and WebSocket) on rest_api.push.PUSH_PATH is handled
+before Django, see rest_api/push.py.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_tracker_server.settings')
 
-application = get_asgi_application()
+ASYNC_URLCONF = 'rest_api.async_urls'
+
+class AsyncReadHandler(ASGIHandler):
+
+    async def get_response_async(self, request):
+        request.urlconf = ASYNC_URLCONF
+        return await super().get_response_async(request)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        # Streaming bodies such as task exports query the database as they're
+        # iterated, so pull each part from the sync thread, not the event loop
+        response_headers = [(header.encode('ascii'), value.encode('latin1')) for header, value in response.items()]
+        for cookie in response.cookies.values():
+            response_headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': response_headers})
+
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, last in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+django.setup(set_prefix=False)
+django_application = AsyncReadHandler()
+
+from rest_api.push import PUSH_PATH, push_endpoint  # noqa: E402, needs the app registry
+
+async def application(scope, receive, send):
+    if scope['type'] in ('http', 'websocket') and scope['path'] == PUSH_PATH:
+        return await push_endpoint(scope, receive, send)
+    return await django_application(scope, receive, send)
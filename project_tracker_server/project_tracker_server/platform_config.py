@@ -0,0 +1,84 @@
+"""
+Elastic Beanstalk environment resolution for settings.py.
+
+Only used when RDS_* variables aren't already in the process environment.
+The platform's get-config output is cached in a local file, so settings
+imports after the first don't spawn a process, and hosts without the
+platform tooling simply get an empty environment.
+
+EB_CONFIG_FILE        JSON file to use instead of get-config (local runs, tests)
+EB_CONFIG_CACHE       Where to cache get-config output
+EB_CONFIG_CACHE_TTL   Seconds before the cache is refreshed from get-config
+"""
+
+import ast
+import functools
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+GET_CONFIG = '/opt/elasticbeanstalk/bin/get-config'
+DEFAULT_CACHE = Path(tempfile.gettempdir()) / 'project_tracker_server_eb_environment.json'
+DEFAULT_CACHE_TTL = 3600
+
+def _parse(output):
+    try:
+        return json.loads(output)
+    except ValueError:
+        # Older platforms print a Python literal rather than JSON
+        return ast.literal_eval(output)
+
+def _read_cache(cache_path, ttl):
+    try:
+        if time.time() - os.path.getmtime(cache_path) > ttl:
+            return None
+        with open(cache_path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(cache_path, environment):
+    # Atomic and owner-only, the environment holds database credentials
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, 'w') as cache_file:
+            json.dump(environment, cache_file)
+        os.chmod(temporary_path, 0o600)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass
+
+def load_environment(config_file=None, get_config=GET_CONFIG, cache_path=DEFAULT_CACHE, ttl=DEFAULT_CACHE_TTL):
+    if config_file:
+        with open(config_file) as stand_in:
+            return _parse(stand_in.read())
+
+    cached = _read_cache(cache_path, ttl)
+    if cached is not None:
+        return cached
+
+    if not os.access(get_config, os.X_OK):
+        # Not running on Elastic Beanstalk
+        return {}
+
+    completed_process = subprocess.run(
+        [get_config, 'environment'],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True
+    )
+    environment = _parse(completed_process.stdout)
+    _write_cache(cache_path, environment)
+    return environment
+
+@functools.lru_cache(maxsize=None)
+def platform_environment():
+    return load_environment(
+        config_file=os.environ.get('EB_CONFIG_FILE'),
+        cache_path=os.environ.get('EB_CONFIG_CACHE', DEFAULT_CACHE),
+        ttl=int(os.environ.get('EB_CONFIG_CACHE_TTL', DEFAULT_CACHE_TTL)),
+    )
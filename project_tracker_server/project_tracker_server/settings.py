@@ -11,21 +11,10 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
-import subprocess
-import ast
+from decouple import Csv, config
+from project_tracker_server.platform_config import platform_environment
 import os
 
-def get_environ_vars():
-    completed_process = subprocess.run(
-        ['/opt/elasticbeanstalk/bin/get-config', 'environment'],
-        stdout=subprocess.PIPE,
-        text=True,
-        check=True
-    )
-
-    return ast.literal_eval(completed_process.stdout)
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'rest_api.middleware.RequestMetricsMiddleware',
+    'rest_api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -94,41 +85,92 @@ WSGI_APPLICATION = 'project_tracker_server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-if 'RDS_HOSTNAME' in os.environ:
+# RDS variables come from the process environment, or from the Elastic Beanstalk
+# config (cached on disk, empty off-platform), see platform_config.py
+env_vars = os.environ if 'RDS_HOSTNAME' in os.environ else platform_environment()
+
+if 'RDS_HOSTNAME' in env_vars:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',  # Postgres
-            'NAME': os.environ['RDS_DB_NAME'],
-            'USER': os.environ['RDS_USERNAME'],
-            'PASSWORD': os.environ['RDS_PASSWORD'],
-            'HOST': os.environ['RDS_HOSTNAME'],
-            'PORT': os.environ['RDS_PORT'],
+            'NAME': env_vars['RDS_DB_NAME'],
+            'USER': env_vars['RDS_USERNAME'],
+            'PASSWORD': env_vars['RDS_PASSWORD'],
+            'HOST': env_vars['RDS_HOSTNAME'],
+            'PORT': env_vars['RDS_PORT'],
         },
     }
 else:
-    env_vars = get_environ_vars()
-    if 'RDS_HOSTNAME' in env_vars:
-        DATABASES = {
-            'default': {
-                'ENGINE': 'django.db.backends.postgresql',  # Postgres
-                'NAME': env_vars['RDS_DB_NAME'],
-                'USER': env_vars['RDS_USERNAME'],
-                'PASSWORD': env_vars['RDS_PASSWORD'],
-                'HOST': env_vars['RDS_HOSTNAME'],
-                'PORT': env_vars['RDS_PORT'],
-            },
-        }
-    else:
-        DATABASES = {
-            'default': {
-                'ENGINE': 'django.db.backends.postgresql',  # Postgres
-                'NAME': 'daniel',  # Or path to database file if using sqlite3.
-                'USER': 'daniel',
-                'PASSWORD': 'password',
-                'HOST': '',
-                'PORT': '',
-            },
-        }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',  # Postgres
+            'NAME': 'daniel',  # Or path to database file if using sqlite3.
+            'USER': 'daniel',
+            'PASSWORD': 'password',
+            'HOST': '',
+            'PORT': '',
+        },
+    }
+
+# Read replicas, see rest_api/replicas.py. Each host in DB_REPLICA_HOSTS gets
+# an alias that mirrors the primary's settings. A user's reads stay on the
+# primary for REPLICA_PIN_SECONDS after they write, keep it above the
+# replication lag.
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+DATABASE_REPLICAS = []
+for number, host in enumerate(DB_REPLICA_HOSTS, 1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['rest_api.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
+# Persistent connections, pinged when reused, see rest_api/db.py.
+# DB_TRANSACTION_POOLING is for running behind a transaction pooling proxy
+# such as PgBouncer: it turns off server-side cursors, which outlive the
+# transaction that opened them.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_TRANSACTION_POOLING = config('DB_TRANSACTION_POOLING', default=False, cast=bool)
+
+for database in DATABASES.values():
+    database.update({
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_TRANSACTION_POOLING,
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# ACL maps, list ETag versions, cached tokens and replica pins are invalidated
+# through this cache, so every worker and instance must share it: point
+# CACHE_BACKEND/CACHE_LOCATION at Redis or memcached in production. The local
+# memory default is per process, with it those caches are turned off
+# (CACHE_SHARED) once WEB_CONCURRENCY runs more than one gunicorn worker. Set
+# CACHE_SHARED=False when running several instances on local memory caches.
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+}
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+CACHE_SHARED = config('CACHE_SHARED', default=not CACHE_BACKEND.endswith('LocMemCache') or WEB_CONCURRENCY <= 1, cast=bool)
+
+# Seconds a user's project ACL map stays cached, see rest_api/cache.py
+ACL_CACHE_TIMEOUT = config('ACL_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds a token's user stays cached, see rest_api/authentication.py
+AUTH_TOKEN_CACHE_TIMEOUT = config('AUTH_TOKEN_CACHE_TIMEOUT', default=60, cast=int)
+
+# Where throttle counters live, see rest_api/throttling.py. The cache store is
+# only shared between processes when THROTTLE_CACHE is, on a single host with
+# local memory caches use rest_api.throttling.SQLiteThrottleStore
+THROTTLE_STORE = config('THROTTLE_STORE', default='rest_api.throttling.CacheThrottleStore')
+THROTTLE_CACHE = config('THROTTLE_CACHE', default='default')
 
 
 # Password validation
@@ -177,15 +219,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'rest_api.throttling.AnonRateThrottle',
+        'rest_api.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '200/day',
         'user': '2000/hour'
     },
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'rest_api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -223,5 +265,29 @@ LOGGING = {
             'handlers': ['console'],
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
         },
+        # Slow requests log warnings, DEBUG adds a line for every request
+        'rest_api.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
+
+# Per-request metrics, see rest_api/instrumentation.py
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+
+# Delta sync, see rest_api/sync.py
+SYNC_OVERLAP_SECONDS = config('SYNC_OVERLAP_SECONDS', default=5, cast=int)
+TOMBSTONE_RETENTION_DAYS = config('TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Server push over ASGI, see rest_api/push.py
+PUSH_BROKER = config('PUSH_BROKER', default='rest_api.push.InMemoryBroker')
+PUSH_KEEPALIVE_SECONDS = config('PUSH_KEEPALIVE_SECONDS', default=15, cast=int)
+
+# Background project deletion, see rest_api/purge.py. Projects with more tasks
+# than PURGE_TASK_THRESHOLD, or left in the trash for PROJECT_TRASH_RETENTION_DAYS,
+# are deleted by `manage.py purge_projects`
+PURGE_TASK_THRESHOLD = config('PURGE_TASK_THRESHOLD', default=1000, cast=int)
+PROJECT_TRASH_RETENTION_DAYS = config('PROJECT_TRASH_RETENTION_DAYS', default=30, cast=int)
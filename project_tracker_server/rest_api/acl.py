@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db.models import F, FilteredRelation, Q
+from rest_api.cache import get_acl
+from rest_api.models import Project, ProjectMembership
+from rest_api.replicas import PRIMARY
+
+# Request-scoped access control
+#
+# Permission classes, filters and serializers all need the same answer to
+# "what can this user do on project N?". The context loads it once per
+# request and every caller reads from the same map.
+
+PROJECT_SCOPE_LIST_LIMIT = getattr(settings, 'PROJECT_SCOPE_LIST_LIMIT', 500)
+
+class PermissionContext:
+
+    def __init__(self, user):
+        self.user = user
+        self._projects = None
+
+    @property
+    def projects(self):
+        # {project_id: (permission_level, location, is_owner)}
+        if self._projects is None:
+            self._projects = get_acl(self.user.id, self.load)
+        return self._projects
+
+    def queryset(self):
+        # Projects the user is a member of or owns, in a single query. Read from
+        # the primary, a lagging replica's answer would stay cached
+        return Project.objects.using(PRIMARY).annotate(
+            user_membership=FilteredRelation('projectMemberships', condition=Q(projectMemberships__owner=self.user)),
+        ).filter(
+            Q(owner=self.user) | Q(user_membership__isnull=False), purge__isnull=True
+        ).order_by().values_list('id', 'user_membership__permission_level', 'user_membership__location', 'owner')
+
+    def load(self):
+        return {
+            project_id: (permission_level, location, owner_id == self.user.id)
+            for project_id, permission_level, location, owner_id in self.queryset()
+        }
+
+    def is_owner(self, project_id):
+        return self.projects.get(project_id, (None, None, False))[2]
+
+    def permission_level(self, project_id):
+        return self.projects.get(project_id, (None, None, False))[0]
+
+    def has_level(self, project_id, level):
+        # Project owners always pass, members need a level at least as strong as `level`
+        if self.is_owner(project_id):
+            return True
+        permission_level = self.permission_level(project_id)
+        return permission_level is not None and permission_level <= level
+
+    def project_ids(self, location=None):
+        # Projects the user holds a membership on, optionally in one location
+        return [
+            project_id for project_id, (permission_level, project_location, is_owner) in self.projects.items()
+            if permission_level is not None and (location is None or project_location == location)
+        ]
+
+    def project_scope(self):
+        # project_ids() for scoping lists in SQL. Past PROJECT_SCOPE_LIST_LIMIT
+        # memberships an inlined IN list gets too long, select them in a subquery instead
+        project_ids = self.project_ids()
+        if len(project_ids) <= PROJECT_SCOPE_LIST_LIMIT:
+            return project_ids
+        return ProjectMembership.objects.filter(owner=self.user, project__purge__isnull=True).values('project_id')
+
+def with_user_membership(queryset, user):
+    # Join the user's membership onto projects once instead of looking it up per row
+    return queryset.annotate(
+        user_membership=FilteredRelation('projectMemberships', condition=Q(projectMemberships__owner=user)),
+        membership=F('user_membership__id'),
+        permission_level=F('user_membership__permission_level'),
+        location=F('user_membership__location'),
+    )
+
+def get_permission_context(request):
+    # Stored on the underlying HttpRequest so every DRF Request wrapper shares it
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, '_permission_context', None)
+    if context is None or context.user != request.user:
+        context = PermissionContext(request.user)
+        http_request._permission_context = context
+    return context
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RestApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rest_api'
+
+    def ready(self):
+        # Register signal handlers
+        from rest_api import db, signals  # noqa: F401
@@ -0,0 +1,19 @@
+from django.urls import include, path
+from rest_api import views
+from rest_api.async_views import async_viewset_view
+
+# URLconf for requests served through project_tracker_server/asgi.py
+#
+# Task and project endpoints go through async views, everything else falls
+# through to the regular URLconf.
+
+list_actions = {'get': 'list', 'post': 'create'}
+detail_actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+urlpatterns = [
+    path('projects/', async_viewset_view(views.ProjectViewSet, list_actions)),
+    path('projects/<int:pk>/', async_viewset_view(views.ProjectViewSet, detail_actions)),
+    path('tasks/', async_viewset_view(views.TaskViewSet, list_actions)),
+    path('tasks/<int:pk>/', async_viewset_view(views.TaskViewSet, detail_actions)),
+    path('', include('project_tracker_server.urls')),
+]
@@ -0,0 +1,46 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_api.db import check_connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Async entry points for the read-heavy viewsets under ASGI
+#
+# Django 3.2 runs sync views under ASGI on a single thread, one request at a
+# time. These wrappers run safe requests in sync_to_async worker threads
+# instead, so concurrent reads overlap their database waits. Each worker
+# thread has its own connection, health checked on first use and aged out by CONN_MAX_AGE
+# just like the handler thread's (see rest_api/db.py). Writes keep the default
+# single thread so transactions and signal handlers behave exactly as they do
+# under WSGI.
+
+def async_viewset_view(viewset, actions):
+    view = viewset.as_view(actions)
+
+    def respond(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def respond_and_close(request, *args, **kwargs):
+        # request_started only marked the handler thread's connections for a check
+        check_connections()
+        try:
+            return respond(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    read = sync_to_async(respond_and_close, thread_sensitive=False)
+    write = sync_to_async(respond, thread_sensitive=True)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    # Same attributes as the DRF view, for RequestMetricsMiddleware and CSRF handling
+    async_view.cls = view.cls
+    async_view.actions = view.actions
+    async_view.initkwargs = view.initkwargs
+    async_view.csrf_exempt = True
+    return async_view
@@ -0,0 +1,43 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_api.cache import cache_shared
+
+# Token authentication with a short-lived cache in front of the Token + User join
+#
+# Entries are dropped as soon as the token is deleted (djoser's token/logout)
+# or its user is saved, so logging out or deactivating takes effect at once.
+
+AUTH_TOKEN_CACHE_ALIAS = getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'default')
+AUTH_TOKEN_CACHE_TIMEOUT = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+
+def _cache():
+    return caches[AUTH_TOKEN_CACHE_ALIAS]
+
+def _token_cache_key(key):
+    # Never use the raw token as a cache key
+    return 'authtoken:%s' % hashlib.sha256(key.encode()).hexdigest()
+
+def invalidate_token(key):
+    _cache().delete(_token_cache_key(key))
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        if not cache_shared():
+            return super().authenticate_credentials(key)
+        cache_key = _token_cache_key(key)
+        cached = _cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        _cache().set(cache_key, (user, token), timeout=AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, token
@@ -0,0 +1,213 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_api.acl import get_permission_context
+from rest_api.cache import invalidate_project, invalidate_user
+from rest_api.models import ProjectMembership, Task, Tombstone
+from rest_api.serializers import ProjectMembershipSerializer, TaskSerializer
+from rest_api.push import publish_membership, publish_task
+from rest_api.summary import add_change, apply_changes, changes, task_state
+
+# Bulk operations
+#
+# Every item is validated and permission checked before anything is written.
+# If any item fails, nothing is applied and the response lists each item's
+# outcome; items that were fine on their own report 424 (failed dependency).
+
+MAX_OPERATIONS = 500
+
+class BulkError(Exception):
+    # Request level problem, the payload couldn't be interpreted at all
+    pass
+
+def _operations(data):
+    if not isinstance(data, list):
+        raise BulkError('Expected a list of operations.')
+    if len(data) > MAX_OPERATIONS:
+        raise BulkError('At most %d operations per request.' % MAX_OPERATIONS)
+    if not all(isinstance(item, dict) for item in data):
+        raise BulkError('Each operation must be an object.')
+    return data
+
+def _result(index, item_status, **fields):
+    return dict(index=index, status=item_status, **fields)
+
+def _finish(results, apply):
+    # Apply everything in one transaction, or report why nothing was applied
+    if any(result['status'] >= 400 for result in results):
+        for result in results:
+            if result['status'] < 400:
+                result['status'] = status.HTTP_424_FAILED_DEPENDENCY
+                result.pop('data', None)
+        return status.HTTP_400_BAD_REQUEST, results
+
+    with transaction.atomic():
+        apply()
+    return status.HTTP_200_OK, results
+
+def bulk_tasks(request, data):
+    # [{"op": "create", "data": {...}}, {"op": "update", "id": 1, "data": {...}}, {"op": "delete", "id": 2}]
+    operations = _operations(data)
+    context = get_permission_context(request)
+
+    ids = [item.get('id') for item in operations if item.get('op') in ('update', 'delete')]
+    tasks = Task.objects.select_related('owner').in_bulk([task_id for task_id in ids if isinstance(task_id, int)])
+
+    # One permission check per distinct project
+    allowed = {}
+    def can_edit(project_id):
+        if project_id not in allowed:
+            allowed[project_id] = context.has_level(project_id, ProjectMembership.EDIT)
+        return allowed[project_id]
+
+    results = []
+    creates, updates, deletes = [], [], []
+    update_fields = set()
+    # One operation per task, a second would act on the first one's result
+    seen = set()
+
+    for index, item in enumerate(operations):
+        op = item.get('op')
+        if op == 'create':
+            serializer = TaskSerializer(data=item.get('data', {}), context={'request': request})
+            if not serializer.is_valid():
+                results.append(_result(index, status.HTTP_400_BAD_REQUEST, errors=serializer.errors))
+                continue
+            task = Task(**dict(serializer.validated_data, owner=request.user))
+            if not can_edit(task.project_id):
+                results.append(_result(index, status.HTTP_403_FORBIDDEN))
+                continue
+            creates.append((task, len(results)))
+            results.append(_result(index, status.HTTP_201_CREATED))
+        elif op in ('update', 'delete'):
+            task = tasks.get(item.get('id'))
+            if task is None:
+                results.append(_result(index, status.HTTP_404_NOT_FOUND, id=item.get('id')))
+                continue
+            if task.id in seen:
+                results.append(_result(index, status.HTTP_400_BAD_REQUEST, id=task.id, errors={'id': ['Duplicate operation for this task.']}))
+                continue
+            seen.add(task.id)
+            if not can_edit(task.project_id):
+                results.append(_result(index, status.HTTP_403_FORBIDDEN, id=task.id))
+                continue
+            if op == 'delete':
+                deletes.append(task.id)
+                results.append(_result(index, status.HTTP_204_NO_CONTENT, id=task.id))
+                continue
+            serializer = TaskSerializer(task, data=item.get('data', {}), partial=True, context={'request': request})
+            if not serializer.is_valid():
+                results.append(_result(index, status.HTTP_400_BAD_REQUEST, id=task.id, errors=serializer.errors))
+                continue
+            if 'project' in serializer.validated_data and not can_edit(serializer.validated_data['project'].id):
+                # Moving a task needs edit rights on both projects
+                results.append(_result(index, status.HTTP_403_FORBIDDEN, id=task.id))
+                continue
+            for attr, value in serializer.validated_data.items():
+                setattr(task, attr, value)
+                update_fields.add(attr)
+            updates.append((task, len(results)))
+            results.append(_result(index, status.HTTP_200_OK, id=task.id))
+        else:
+            results.append(_result(index, status.HTTP_400_BAD_REQUEST, errors={'op': ['Must be one of create, update or delete.']}))
+
+    def apply():
+        # Summary deltas of the writes that send no signals, applied in one UPDATE per project
+        deltas = changes()
+        new_tasks = [task for task, position in creates]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Task.objects.bulk_create(new_tasks)
+            for task in new_tasks:
+                add_change(deltas, None, task_state(task))
+        else:
+            # Backends that can't return ids from a bulk insert
+            for task in new_tasks:
+                task.save()
+        if updates:
+            # bulk_update doesn't touch auto_now fields
+            now = timezone.now()
+            for task, position in updates:
+                task.updated_at = now
+            Task.objects.bulk_update([task for task, position in updates], sorted(update_fields | {'updated_at'}))
+            # Once per task, whatever the batch holds; deleted tasks count through their signals
+            updated = {task.id: task for task, position in updates if task.id not in deletes}
+            for task in updated.values():
+                add_change(deltas, task._summary_state, task_state(task))
+                task._summary_state = task_state(task)
+        apply_changes(deltas)
+        # Tombstones for moved tasks, as the post_save receiver would write
+        Tombstone.objects.bulk_create([
+            Tombstone(kind=Tombstone.TASK, object_id=task.id, project_id=task._previous_project_id)
+            for task, position in updates if task._previous_project_id != task.project_id
+        ])
+        if deletes:
+            Task.objects.filter(id__in=deletes).delete()
+
+        # bulk_create and bulk_update send no signals, bump the touched projects ourselves
+        touched = {task.project_id for task, position in creates + updates}
+        touched.update(task._previous_project_id for task, position in updates)
+        for project_id in touched:
+            invalidate_project(project_id)
+
+        for task, position in creates + updates:
+            results[position]['data'] = TaskSerializer(task, context={'request': request}).data
+
+        # Push the writes that sent no signals, deletes are pushed by theirs
+        if connection.features.can_return_rows_from_bulk_insert:
+            for task, position in creates:
+                publish_task(task, created=True)
+        for task, position in updates:
+            publish_task(task, previous_project_id=task._previous_project_id)
+
+    return _finish(results, apply)
+
+def bulk_membership_locations(request, data):
+    # [{"id": 1, "location": 2}, ...]
+    operations = _operations(data)
+    context = get_permission_context(request)
+
+    ids = [item.get('id') for item in operations]
+    memberships = ProjectMembership.objects.select_related('project', 'owner').in_bulk([membership_id for membership_id in ids if isinstance(membership_id, int)])
+
+    # One permission check per distinct project
+    allowed = {}
+    def can_share(project_id):
+        if project_id not in allowed:
+            allowed[project_id] = context.has_level(project_id, ProjectMembership.SHARE)
+        return allowed[project_id]
+
+    results = []
+    updates = []
+
+    for index, item in enumerate(operations):
+        membership = memberships.get(item.get('id'))
+        if membership is None:
+            results.append(_result(index, status.HTTP_404_NOT_FOUND, id=item.get('id')))
+            continue
+        # Same rule as ProjectMembershipPermissions.has_object_permission
+        if not (context.is_owner(membership.project_id) or (can_share(membership.project_id) and not membership.project.owner_id == membership.owner_id)):
+            results.append(_result(index, status.HTTP_403_FORBIDDEN, id=membership.id))
+            continue
+        serializer = ProjectMembershipSerializer(membership, data={'location': item.get('location')}, partial=True, context={'request': request})
+        if not serializer.is_valid():
+            results.append(_result(index, status.HTTP_400_BAD_REQUEST, id=membership.id, errors=serializer.errors))
+            continue
+        membership.location = serializer.validated_data['location']
+        updates.append((membership, len(results)))
+        results.append(_result(index, status.HTTP_200_OK, id=membership.id))
+
+    def apply():
+        now = timezone.now()
+        for membership, position in updates:
+            membership.update_trashed_at(now)
+            membership.updated_at = now
+        ProjectMembership.objects.bulk_update([membership for membership, position in updates], ['location', 'trashed_at', 'updated_at'])
+        # bulk_update sends no signals, invalidate the cached ACLs ourselves
+        for owner_id in {membership.owner_id for membership, position in updates}:
+            invalidate_user(owner_id)
+
+        for membership, position in updates:
+            results[position]['data'] = ProjectMembershipSerializer(membership, context={'request': request}).data
+            publish_membership(membership)
+
+    return _finish(results, apply)
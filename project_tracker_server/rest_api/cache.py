@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+from django.dispatch import Signal
+
+# Cross-request cache of each user's project ACL map, plus per-project versions
+#
+# Entries live under a per-user version number. Invalidating a user only bumps
+# that number, so any previously cached map becomes unreachable in O(1) and
+# simply ages out of the backend. Projects carry the same kind of counter,
+# bumped whenever the project or one of its tasks changes.
+
+ACL_CACHE_ALIAS = getattr(settings, 'ACL_CACHE_ALIAS', 'default')
+ACL_CACHE_TIMEOUT = getattr(settings, 'ACL_CACHE_TIMEOUT', 300)
+# Whether every worker sees the same cache, see CACHES in settings.py
+CACHE_SHARED = getattr(settings, 'CACHE_SHARED', True)
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+# Sent with user_id once a change to that user's ACL has committed
+acl_invalidated = Signal()
+
+def _cache():
+    return caches[ACL_CACHE_ALIAS]
+
+def cache_shared():
+    # Invalidations only reach other workers through a shared cache, cross-request caching is off without one
+    return CACHE_SHARED
+
+@register(Tags.caches)
+def check_cache_shared(app_configs, **kwargs):
+    if cache_shared():
+        return []
+    return [Warning(
+        'The cache is not shared between workers, ACL, token and ETag caching and replica reads are off.',
+        hint='Point CACHE_BACKEND and CACHE_LOCATION at Redis or memcached.',
+        id='rest_api.W001',
+    )]
+
+def _version_key(user_id):
+    return 'acl:version:%s' % user_id
+
+def _project_version_key(project_id):
+    return 'project:version:%s' % project_id
+
+def _acl_key(user_id, version):
+    return 'acl:%s:%s' % (user_id, version)
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def _initial_version():
+    # Start from the clock, so a counter that was evicted and re-created can't
+    # come back at a value an earlier cache entry or ETag was built from
+    return time.time_ns() // 1000
+
+def _get_versions(keys):
+    cache = _cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps a concurrent first writer from being overwritten
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+def _bump(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version stored yet, nothing cached can be reachable
+        cache.add(key, _initial_version(), timeout=None)
+
+def _invalidate(key):
+    # Bump now so the writing request sees its own change, and again after commit
+    # so a concurrent reader can't cache pre-commit data under the new version
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+def get_version(user_id):
+    return _get_versions([_version_key(user_id)])[_version_key(user_id)]
+
+def get_acl(user_id, loader):
+    # Return the cached ACL map for user_id, calling loader() on a miss
+    if not cache_shared():
+        return loader()
+    cache = _cache()
+    key = _acl_key(user_id, get_version(user_id))
+    acl = cache.get(key)
+    if acl is not None:
+        _count('hits')
+        return acl
+
+    _count('misses')
+    acl = loader()
+    cache.set(key, acl, timeout=ACL_CACHE_TIMEOUT)
+    return acl
+
+def invalidate_user(user_id):
+    _count('invalidations')
+    _invalidate(_version_key(user_id))
+    transaction.on_commit(lambda: acl_invalidated.send(sender=None, user_id=user_id))
+
+def get_project_versions(project_ids):
+    # {project_id: version} in one cache round trip for the common case
+    keys = {_project_version_key(project_id): project_id for project_id in project_ids}
+    return {keys[key]: version for key, version in _get_versions(list(keys)).items()}
+
+def invalidate_project(project_id):
+    _invalidate(_project_version_key(project_id))
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
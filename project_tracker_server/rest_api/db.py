@@ -0,0 +1,60 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Persistent database connections
+#
+# settings.py keeps connections open across requests (CONN_MAX_AGE). One the
+# server or a proxy dropped while it sat idle would otherwise only fail on the
+# request that next uses it, so with CONN_HEALTH_CHECKS (the setting name
+# Django 4.1 adopted for the same thing) a reused connection is pinged before
+# its first query of a request and closed if it doesn't answer. Django
+# reconnects on first use. As in Django 4.1 the check is lazy: marking the
+# connections as the request starts costs nothing, aliases the request never
+# uses are never pinged, and the others at most once per request.
+
+def _health_checks(connection):
+    return connection.settings_dict.get('CONN_HEALTH_CHECKS')
+
+def _ping_if_due(connection):
+    if connection.health_check_done or connection.connection is None:
+        return
+    if connection.in_atomic_block:
+        # Can't be replaced mid-transaction
+        return
+    connection.health_check_done = True
+    if not connection.is_usable():
+        connection.close()
+
+def _install(connection):
+    # Every cursor and transaction goes through ensure_connection() first
+    if getattr(connection, '_health_check_installed', False):
+        return
+    ensure_connection = connection.ensure_connection
+
+    def checked_ensure_connection():
+        _ping_if_due(connection)
+        ensure_connection()
+    connection.ensure_connection = checked_ensure_connection
+    connection._health_check_installed = True
+
+@receiver(connection_created)
+def skip_new_connection_check(sender, connection, **kwargs):
+    # Nothing to check on a connection opened for this request
+    if _health_checks(connection):
+        _install(connection)
+        connection.health_check_done = True
+
+def check_connections():
+    # Have each reused connection pinged before its next query
+    for connection in connections.all():
+        if connection.connection is None or not _health_checks(connection):
+            continue
+        _install(connection)
+        connection.health_check_done = False
+
+@receiver(request_started)
+def check_connections_on_request(sender, **kwargs):
+    # Runs after Django's own close_old_connections, which drops expired connections
+    check_connections()
@@ -0,0 +1,54 @@
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_api.acl import get_permission_context
+from rest_api.cache import cache_shared, get_project_versions, get_version
+from rest_api.replicas import replica_used
+
+# Conditional GET for list endpoints
+#
+# A list's ETag is derived from the user's ACL version and the versions of the
+# projects it can draw rows from, all of which live in the cache. A matching
+# If-None-Match is answered with 304 before the list query or serializer runs.
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+class ConditionalListMixin:
+
+    def get_etag_project_ids(self, request, context):
+        # Projects whose changes can alter this list, everything visible by default
+        return context.projects.keys()
+
+    def get_list_etag(self, request):
+        context = get_permission_context(request)
+        project_versions = get_project_versions(self.get_etag_project_ids(request, context))
+
+        parts = [
+            self.__class__.__name__,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            str(request.user.id),
+            str(get_version(request.user.id)),
+        ]
+        parts += ['%s:%s' % item for item in sorted(project_versions.items())]
+        return '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        if not cache_shared():
+            # Another worker's version bumps wouldn't reach this one's ETags
+            return super().list(request, *args, **kwargs)
+        etag = self.get_list_etag(request)
+        if _matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = super().list(request, *args, **kwargs)
+        # The versions are current, rows from a lagging replica may not be. A match
+        # above is still right: nothing changed since a primary read gave out the ETag
+        if not replica_used():
+            response['ETag'] = etag
+        return response
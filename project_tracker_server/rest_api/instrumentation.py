@@ -0,0 +1,125 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('rest_api.requests')
+
+# Per-request SQL and latency metrics
+#
+# RequestMetricsMiddleware opens a RequestMetrics for every request and every
+# database connection reports its queries into it. Serializers and the
+# middleware's own hooks add the serialize/view/render phases. The current
+# metrics live in a context variable, so queries run from sync_to_async worker
+# threads under ASGI are attributed to the right request.
+
+SERVER_TIMING_HEADER = getattr(settings, 'SERVER_TIMING_HEADER', True)
+SLOW_REQUEST_MS = getattr(settings, 'SLOW_REQUEST_MS', 500)
+MAX_RECORDED_QUERIES = 200
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.query_count = 0
+        self.db_time = 0.0
+        self.queries = []
+        self.phases = {}
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_query(self, sql, seconds):
+        self.query_count += 1
+        self.db_time += seconds
+        if len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries.append((sql, seconds))
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        entries = ['db;dur=%.2f;desc="%d queries"' % (self.db_time * 1000, self.query_count)]
+        entries += ['%s;dur=%.2f' % (name, seconds * 1000) for name, seconds in self.phases.items()]
+        entries.append('total;dur=%.2f' % (total * 1000))
+        return ', '.join(entries)
+
+def current_metrics():
+    return _current.get()
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+def _install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Every connection, in whichever thread opens it, reports to the current request
+    _install(connection)
+
+@contextmanager
+def collect_metrics():
+    # Attach a fresh RequestMetrics to the current context
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    for alias in connections:
+        # Connections opened before this module was imported
+        _install(connections[alias])
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def timed(phase):
+    # Add the enclosed block's duration to the current request's `phase`, if any
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(phase, time.perf_counter() - started)
+
+def log_request(request, response, metrics, total):
+    # Slow requests are logged as warnings, the rest only at DEBUG (REQUEST_LOG_LEVEL=DEBUG)
+    slow = total * 1000 >= SLOW_REQUEST_MS
+    if not slow and not logger.isEnabledFor(logging.DEBUG):
+        return
+    fields = {
+        'view': metrics.view or '-',
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': metrics.query_count,
+        'db_ms': round(metrics.db_time * 1000, 2),
+        'total_ms': round(total * 1000, 2),
+    }
+    fields.update({'%s_ms' % name: round(seconds * 1000, 2) for name, seconds in metrics.phases.items()})
+    message = ' '.join('%s=%s' % item for item in fields.items())
+
+    if slow:
+        dump = '\n'.join('  %.2fms %s' % (seconds * 1000, sql) for sql, seconds in metrics.queries)
+        logger.warning('slow request %s\n%s', message, dump, extra={'metrics': fields})
+    else:
+        logger.debug('request %s', message, extra={'metrics': fields})
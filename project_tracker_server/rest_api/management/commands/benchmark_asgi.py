@@ -0,0 +1,124 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_api.models import ProjectMembership, Task
+
+class Command(BaseCommand):
+    help = 'Compare read throughput of the WSGI application with the async views served by the ASGI application'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to authenticate as, defaults to the user with the most memberships')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per application')
+        parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight, WSGI worker threads or ASGI connections')
+
+    def handle(self, *args, **options):
+        from project_tracker_server.asgi import application as asgi_application
+        from project_tracker_server.wsgi import application as wsgi_application
+
+        user = self.get_user(options['user'])
+        token, created = Token.objects.get_or_create(user=user)
+        membership = ProjectMembership.objects.filter(owner=user).first()
+        task = Task.objects.filter(project=membership.project).first()
+
+        paths = ['/projects/', '/projects/%d/' % membership.project_id, '/tasks/', ('/tasks/', 'project=%d' % membership.project_id)]
+        if task is not None:
+            paths.append('/tasks/%d/' % task.id)
+        paths = [path if isinstance(path, tuple) else (path, '') for path in paths]
+        requests = [paths[number % len(paths)] for number in range(options['requests'])]
+        authorization = 'Token ' + token.key
+
+        self.stdout.write('%-6s %10s %10s %10s' % ('', 'req/s', 'p50 ms', 'p95 ms'))
+        try:
+            for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                application = wsgi_application if name == 'wsgi' else asgi_application
+                run(application, requests[:len(paths)], authorization, options['concurrency'])  # Warm up
+                started = time.perf_counter()
+                latencies = run(application, requests, authorization, options['concurrency'])
+                elapsed = time.perf_counter() - started
+                latencies.sort()
+                self.stdout.write('%-6s %10.1f %10.2f %10.2f' % (
+                    name, len(latencies) / elapsed, statistics.median(latencies),
+                    latencies[int(len(latencies) * 0.95) - 1]))
+        finally:
+            if created:
+                token.delete()
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist' % username)
+        user = User.objects.annotate(num_memberships=Count('projectMemberships')).order_by('-num_memberships').first()
+        if user is None or user.num_memberships == 0:
+            raise CommandError('No users with memberships, seed some data first')
+        return user
+
+    def run_wsgi(self, application, requests, authorization, concurrency):
+        # A threaded WSGI server: `concurrency` threads sharing the application
+        def request(path_and_query):
+            path, query = path_and_query
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': authorization,
+                'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            statuses = []
+            started = time.perf_counter()
+            response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            self.check_status(path, int(statuses[0].split()[0]))
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(request, requests))
+
+    def run_asgi(self, application, requests, authorization, concurrency):
+        # An ASGI server: one event loop with `concurrency` requests in flight
+        async def request(path, query):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            statuses = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            self.check_status(path, statuses[0])
+            return (time.perf_counter() - started) * 1000
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(path_and_query):
+                async with semaphore:
+                    return await request(*path_and_query)
+
+            return await asyncio.gather(*[limited(path_and_query) for path_and_query in requests])
+
+        return list(asyncio.run(run_all()))
+
+    def check_status(self, path, status_code):
+        if status_code != 200:
+            raise CommandError('%s returned %d' % (path, status_code))
@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
+from rest_api.authentication import CachedTokenAuthentication
+from rest_api.models import ProjectMembership, Task
+
+class Command(BaseCommand):
+    help = 'Compare queries and latency per endpoint with plain and cached token authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to authenticate as, defaults to the user with the most memberships')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint and authentication class')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        token, created = Token.objects.get_or_create(user=user)
+        membership = ProjectMembership.objects.filter(owner=user).first()
+        task = Task.objects.filter(project=membership.project).first()
+
+        endpoints = ['/users/', '/projects/', '/projects/%d/' % membership.project_id, '/projectmemberships/', '/tasks/', '/tasks/?project=%d' % membership.project_id]
+        if task is not None:
+            endpoints.append('/tasks/%d/' % task.id)
+
+        client = Client(HTTP_AUTHORIZATION='Token ' + token.key)
+        authentication_classes = APIView.authentication_classes
+        self.stdout.write('%-32s %10s %10s %10s %10s' % ('endpoint', 'queries', 'cached', 'ms', 'cached ms'))
+        try:
+            for url in endpoints:
+                plain = self.measure(client, url, TokenAuthentication, options['requests'])
+                cached = self.measure(client, url, CachedTokenAuthentication, options['requests'])
+                self.stdout.write('%-32s %10d %10d %10.2f %10.2f' % (url, plain[0], cached[0], plain[1], cached[1]))
+        finally:
+            APIView.authentication_classes = authentication_classes
+            if created:
+                token.delete()
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist' % username)
+        user = User.objects.annotate(num_memberships=Count('projectMemberships')).order_by('-num_memberships').first()
+        if user is None or user.num_memberships == 0:
+            raise CommandError('No users with memberships, seed some data first')
+        return user
+
+    def measure(self, client, url, authentication_class, requests):
+        # Warm up once, then report queries of the last request and mean latency
+        APIView.authentication_classes = [authentication_class]
+        client.get(url)
+
+        started = time.perf_counter()
+        for number in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError('%s returned %d' % (url, response.status_code))
+        elapsed = (time.perf_counter() - started) / requests * 1000
+        return len(context.captured_queries), elapsed
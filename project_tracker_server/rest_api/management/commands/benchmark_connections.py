@@ -0,0 +1,85 @@
+import statistics
+import time
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_api.models import ProjectMembership
+
+# Connection settings compared, applied to the default database in turn
+MODES = [
+    ('new connection', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent + health checks', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}),
+]
+
+class Command(BaseCommand):
+    help = 'Measure per-request latency with a new database connection per request against persistent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to authenticate as, defaults to the user with the most memberships')
+        parser.add_argument('--requests', type=int, default=300, help='Sequential requests per mode')
+
+    def handle(self, *args, **options):
+        from project_tracker_server.wsgi import application
+
+        if connection.vendor != 'postgresql':
+            self.stderr.write('Warning: the default database is %s, connection setup is far cheaper than over TCP to Postgres' % connection.vendor)
+        user = self.get_user(options['user'])
+        token, created = Token.objects.get_or_create(user=user)
+        membership = ProjectMembership.objects.filter(owner=user).first()
+        path = '/projects/%d/' % membership.project_id
+        authorization = 'Token ' + token.key
+        original = {key: connection.settings_dict.get(key) for key in MODES[0][1]}
+
+        self.stdout.write('%-28s %10s %10s %12s' % ('', 'p50 ms', 'p95 ms', 'saved/req ms'))
+        try:
+            baseline = None
+            for name, mode in MODES:
+                connection.close()
+                connection.settings_dict.update(mode)
+                self.request(application, path, authorization)  # Warm up
+                latencies = sorted(self.request(application, path, authorization) for number in range(options['requests']))
+                median = statistics.median(latencies)
+                baseline = median if baseline is None else baseline
+                self.stdout.write('%-28s %10.2f %10.2f %12.2f' % (
+                    name, median, latencies[int(len(latencies) * 0.95) - 1], baseline - median))
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+            if created:
+                token.delete()
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist' % username)
+        user = User.objects.annotate(num_memberships=Count('projectMemberships')).order_by('-num_memberships').first()
+        if user is None or user.num_memberships == 0:
+            raise CommandError('No users with memberships, seed some data first')
+        return user
+
+    def request(self, application, path, authorization):
+        # One request through the WSGI handler, request_started/finished included
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': authorization,
+            'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        if not statuses[0].startswith('200'):
+            raise CommandError('%s returned %s' % (path, statuses[0]))
+        return (time.perf_counter() - started) * 1000
@@ -0,0 +1,46 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_api.models import Task
+from rest_api.serializers import TaskSerializer
+from rest_api.sparse import serialize_rows, values_plan
+
+class Command(BaseCommand):
+    help = 'Time the per-row cost of listing tasks through TaskSerializer against values() rows, with and without ?fields='
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Tasks fetched per run')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--fields', default='id,name,status', help='Sparse fieldset to time, as passed to ?fields=')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        queryset = Task.objects.order_by('id')[:rows]
+        count = queryset.count()
+        if count == 0:
+            raise CommandError('No tasks, seed some data first')
+
+        plan = values_plan(TaskSerializer)
+        fields = options['fields'].split(',')
+        sparse_plan = [entry for entry in plan if entry[0] in fields]
+        if len(sparse_plan) != len(fields):
+            raise CommandError('Unknown fields in %s' % options['fields'])
+
+        cases = [
+            ('serializer', lambda: TaskSerializer(list(queryset.select_related('owner')), many=True).data),
+            ('values', lambda: serialize_rows(plan, queryset.values(*[column for name, column, field in plan]))),
+            ('values ?fields=%s' % options['fields'],
+             lambda: serialize_rows(sparse_plan, queryset.values(*[column for name, column, field in sparse_plan]))),
+        ]
+        baseline = None
+        for name, case in cases:
+            per_row = statistics.median(self.time(case) for run in range(options['runs'])) / count
+            baseline = baseline or per_row
+            self.stdout.write('%-30s %8.2fus/row  %5.1fx' % (name, per_row * 1000000, baseline / per_row))
+
+    def time(self, case):
+        # Query and serialization together, as a list request pays both
+        started = time.perf_counter()
+        case()
+        return time.perf_counter() - started
@@ -0,0 +1,53 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a cold worker imports, each measured in a fresh interpreter
+TARGETS = [
+    ('settings', 'import importlib, os; importlib.import_module(os.environ["DJANGO_SETTINGS_MODULE"])'),
+    ('urlconf', 'import django; django.setup(); import %s' % settings.ROOT_URLCONF),
+    ('wsgi', 'from project_tracker_server.wsgi import application'),
+    ('asgi', 'from project_tracker_server.asgi import application'),
+]
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+class Command(BaseCommand):
+    help = 'Measure cold import time of settings, the URLconf and the WSGI/ASGI applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per target')
+        parser.add_argument('--top', type=int, default=10, help='Modules with the highest self time to list per target, from -X importtime')
+
+    def handle(self, *args, **options):
+        environment = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'project_tracker_server.settings'))
+
+        for name, statement in TARGETS:
+            timings = [self.wall_time(statement, environment) for run in range(options['runs'])]
+            self.stdout.write(self.style.MIGRATE_HEADING('%s: median %.1fms, min %.1fms over %d runs' % (
+                name, statistics.median(timings), min(timings), len(timings))))
+
+            for self_time, cumulative, module in self.import_breakdown(statement, environment)[:options['top']]:
+                self.stdout.write('  %8.1fms self %8.1fms cumulative  %s' % (self_time / 1000, cumulative / 1000, module))
+
+    def run(self, arguments, environment):
+        return subprocess.run([sys.executable] + arguments, env=environment, cwd=settings.BASE_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+
+    def wall_time(self, statement, environment):
+        code = 'import time; started = time.perf_counter()\n%s\nprint((time.perf_counter() - started) * 1000)' % statement
+        return float(self.run(['-c', code], environment).stdout.strip().splitlines()[-1])
+
+    def import_breakdown(self, statement, environment):
+        # Every imported module, most expensive on its own first
+        modules = []
+        for line in self.run(['-X', 'importtime', '-c', statement], environment).stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                modules.append((int(match.group(1)), int(match.group(2)), match.group(3)))
+        return sorted(modules, reverse=True)
@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from rest_api import views
+from rest_api.acl import PermissionContext
+from rest_api.models import ProjectMembership
+from rest_api.search import search_users
+
+# List and filter paths served by the API, as (viewset, path, query params)
+ENDPOINTS = [
+    (views.ProjectViewSet, '/projects/', {}),
+    (views.ProjectViewSet, '/projects/', {'location': ProjectMembership.ARCHIVE}),
+    (views.ProjectMembershipViewSet, '/projectmemberships/', {}),
+    (views.ProjectMembershipViewSet, '/projectmemberships/', {'location': ProjectMembership.MAIN}),
+    (views.TaskViewSet, '/tasks/', {}),
+    (views.TaskViewSet, '/tasks/', {'project': None}),
+    (views.TaskViewSet, '/tasks/', {'project': None, 'status': 1}),
+    (views.TaskViewSet, '/tasks/', {'project': None, 'priority': 1}),
+    (views.TaskViewSet, '/tasks/', {'project': None, 'category': 1}),
+    (views.TaskViewSet, '/tasks/', {'search': 'login page'}),
+]
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the queries behind each list and filter endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to plan the queries for, defaults to the user with the most memberships')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (Postgres only, executes the queries)')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        project = ProjectMembership.objects.filter(owner=user).values_list('project', flat=True).first()
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+
+        self.stdout.write('Planning as %s on %s\n' % (user.username, connection.vendor))
+
+        # Permission checks
+        self.write_plan('ACL load', PermissionContext(user).queryset(), explain_options)
+        self.write_plan('/users/search/?q=%s&exclude_project=%s' % (user.username[:2], project),
+                        search_users(user.username[:2], views.UserViewSet.search_limit, project), explain_options)
+
+        factory = APIRequestFactory()
+        for viewset, path, params in ENDPOINTS:
+            params = {key: (project if value is None else value) for key, value in params.items()}
+            queryset = self.list_queryset(factory, viewset, path, params, user)
+            label = path + ('?' + '&'.join('%s=%s' % item for item in params.items()) if params else '')
+            self.write_plan(label + ' [count]', queryset, explain_options, count=True)
+            self.write_plan(label + ' [page]', queryset[:api_settings.PAGE_SIZE], explain_options)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist' % username)
+        user = User.objects.annotate(num_memberships=Count('projectMemberships')).order_by('-num_memberships').first()
+        if user is None or user.num_memberships == 0:
+            raise CommandError('No users with memberships, seed some data first')
+        return user
+
+    def list_queryset(self, factory, viewset, path, params, user):
+        # Build the queryset exactly as the list action would
+        view = viewset(action_map={'get': 'list'}, format_kwarg=None, args=(), kwargs={})
+        request = view.initialize_request(factory.get(path, params))
+        request.user = user
+        view.request = request
+        return view.filter_queryset(view.get_queryset())
+
+    def write_plan(self, label, queryset, explain_options, count=False):
+        if count:
+            # Plan the COUNT(*) the paginator issues
+            queryset = queryset.order_by().values('pk')
+            sql, sql_params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                prefix = 'EXPLAIN ANALYZE' if explain_options else ('EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN')
+                cursor.execute('%s SELECT COUNT(*) FROM (%s) subquery' % (prefix, sql), sql_params)
+                plan = '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        else:
+            plan = queryset.explain(**explain_options)
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(plan + '\n')
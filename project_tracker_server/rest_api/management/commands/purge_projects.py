@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_api.models import PurgeJob
+from rest_api.purge import PURGE_BATCH_SIZE, claim_job, queue_expired_trash, run_job
+
+class Command(BaseCommand):
+    help = 'Background worker deleting queued projects in batches, see rest_api/purge.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Work through the queue and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Tasks deleted per statement')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            queued = queue_expired_trash()
+            if queued:
+                self.stdout.write('Queued %d projects left in the trash' % queued)
+
+            while True:
+                job = claim_job()
+                if job is None:
+                    break
+                self.purge(job, options['batch_size'])
+
+            if options['once']:
+                failed = PurgeJob.objects.filter(status=PurgeJob.FAILED).count()
+                if failed:
+                    self.stderr.write('%d purge jobs have failed, see PurgeJob.error' % failed)
+                return
+            time.sleep(options['interval'])
+
+    def purge(self, job, batch_size):
+        self.stdout.write('Purging project %d (%s)' % (job.project_id, job.get_reason_display().lower()))
+        started = time.perf_counter()
+
+        def progress(job):
+            self.stdout.write('  %d/%d tasks deleted' % (job.tasks_deleted, job.tasks_total))
+
+        if run_job(job, batch_size=batch_size, progress=progress):
+            self.stdout.write(self.style.SUCCESS('Purged project %d: %d tasks in %.1fs' % (
+                job.project_id, job.tasks_deleted, time.perf_counter() - started)))
+        else:
+            self.stderr.write('Purging project %d failed, see PurgeJob %d' % (job.project_id, job.id))
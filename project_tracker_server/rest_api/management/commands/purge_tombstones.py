@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_api.models import Tombstone
+from rest_api.sync import TOMBSTONE_RETENTION
+
+class Command(BaseCommand):
+    help = 'Delete tombstones older than TOMBSTONE_RETENTION_DAYS, sync tokens that old are rejected anyway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - TOMBSTONE_RETENTION
+        deleted = 0
+        while True:
+            # Bounded batches so the table isn't locked for long
+            ids = list(Tombstone.objects.filter(deleted_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += Tombstone.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS('Deleted %d tombstones' % deleted))
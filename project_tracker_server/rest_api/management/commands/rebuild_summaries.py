@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_api.summary import check_summaries, rebuild_summaries
+
+class Command(BaseCommand):
+    help = 'Recount project summaries from the task table, repairing any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', type=int, help='Project ids, every project by default')
+        parser.add_argument('--check', action='store_true', help='Only report drift, exit with an error if there is any')
+
+    def handle(self, *args, **options):
+        project_ids = options['projects'] or None
+
+        if options['check']:
+            drift = check_summaries(project_ids)
+            for project_id, column, stored, actual in drift:
+                self.stdout.write('project %d %s: stored %s, actual %d' % (project_id, column, stored, actual))
+            if drift:
+                raise CommandError('%d summary counters have drifted' % len(drift))
+            self.stdout.write(self.style.SUCCESS('Project summaries are consistent'))
+            return
+
+        repaired = rebuild_summaries(project_ids)
+        self.stdout.write(self.style.SUCCESS('Repaired %d project summaries' % repaired))
@@ -0,0 +1,164 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from rest_api.models import Project, ProjectMembership, Task
+from rest_api.summary import rebuild_summaries
+
+# Weighted choices for generated rows, roughly what real boards look like
+LOCATION_WEIGHTS = [(ProjectMembership.MAIN, 80), (ProjectMembership.ARCHIVE, 15), (ProjectMembership.TRASH, 5)]
+PERMISSION_WEIGHTS = [(ProjectMembership.SHARE, 10), (ProjectMembership.EDIT, 40), (ProjectMembership.VIEW, 50)]
+STATUS_WEIGHTS = [(Task.BACKLOG, 40), (Task.IN_PROGRESS, 20), (Task.TESTING, 10), (Task.COMPLETED, 30)]
+PRIORITY_WEIGHTS = [(Task.Wishlist, 30), (Task.LOW, 30), (Task.MEDIUM, 25), (Task.HIGH, 15)]
+CATEGORY_WEIGHTS = [(Task.TASK, 50), (Task.FEATURE, 25), (Task.BUGFIX, 20), (Task.OTHER, 5)]
+
+class WeightedChoice:
+    # Repeated weighted picks without rebuilding the cumulative weights each time
+
+    def __init__(self, rng, values, weights):
+        self.rng = rng
+        self.values = values
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def pick(self, k=1):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+class Command(BaseCommand):
+    help = 'Seed the database in-process with large, deterministic, skewed test data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=5000)
+        parser.add_argument('--memberships', type=int, default=20000, help='Total memberships, including one SHARE membership per project owner')
+        parser.add_argument('--tasks', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1542, help='Random seed, the same seed and counts produce the same data')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for project sizes, 0 spreads rows evenly')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='Username prefix for the generated users')
+
+    def handle(self, *args, **options):
+        if options['memberships'] < options['projects']:
+            raise CommandError('--memberships must be at least --projects, every project owner gets a membership')
+        if options['memberships'] > options['users'] * options['projects']:
+            raise CommandError('--memberships can\'t exceed --users x --projects')
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError('Users prefixed "%s" already exist, pick another --prefix' % options['prefix'])
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        started = time.monotonic()
+
+        user_ids = self.create_users(options['users'], options['prefix'])
+        project_ids, project_owners = self.create_projects(options['projects'], user_ids)
+
+        # A handful of huge projects and a long tail of small ones
+        project_weights = [1 / (rank + 1) ** options['skew'] for rank in range(len(project_ids))]
+        self.rng.shuffle(project_weights)
+        project_choice = WeightedChoice(self.rng, project_ids, project_weights)
+
+        members = self.create_memberships(options['memberships'], user_ids, project_ids, project_owners, project_choice)
+        self.create_tasks(options['tasks'], project_choice, members)
+        # bulk_create skips the signals that maintain project summaries
+        rebuild_summaries(project_ids)
+
+        self.stdout.write(self.style.SUCCESS('Seeded in %.1fs' % (time.monotonic() - started)))
+
+    def bulk_insert(self, model, rows, total, label):
+        # Insert generated rows chunk by chunk so memory stays flat
+        created = 0
+        for chunk in iter(lambda: list(itertools.islice(rows, self.chunk_size)), []):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+            created += len(chunk)
+            self.stdout.write('\r%s: %d/%d' % (label, created, total), ending='')
+            self.stdout.flush()
+        self.stdout.write('')
+
+    def new_ids(self, model, previous_max):
+        # Ids of the rows just inserted, bulk_create doesn't return them on every backend
+        return list(model.objects.filter(id__gt=previous_max or 0).order_by('id').values_list('id', flat=True))
+
+    def create_users(self, count, prefix):
+        previous_max = User.objects.aggregate(Max('id'))['id__max']
+        password = make_password('pass1542')
+        rows = (
+            User(username='%s%d' % (prefix, number), email='%s%d@test.com' % (prefix, number), password=password)
+            for number in range(count)
+        )
+        self.bulk_insert(User, rows, count, 'Users')
+        return self.new_ids(User, previous_max)
+
+    def create_projects(self, count, user_ids):
+        previous_max = Project.objects.aggregate(Max('id'))['id__max']
+        owners = [self.rng.choice(user_ids) for number in range(count)]
+        rows = (
+            Project(name='Project %d' % number, description='Seeded project %d' % number, owner_id=owner)
+            for number, owner in enumerate(owners)
+        )
+        self.bulk_insert(Project, rows, count, 'Projects')
+        project_ids = self.new_ids(Project, previous_max)
+        return project_ids, dict(zip(project_ids, owners))
+
+    def create_memberships(self, count, user_ids, project_ids, project_owners, project_choice):
+        # Owners first, then extra members skewed towards the big projects
+        members = {project_id: [owner] for project_id, owner in project_owners.items()}
+        pairs = set(project_owners.items())
+        extra = []
+
+        def add(pair):
+            if pair not in pairs:
+                pairs.add(pair)
+                extra.append(pair)
+                members[pair[0]].append(pair[1])
+
+        # Skewed draws collide more and more as the big projects fill up, so they get a bounded number of tries
+        attempts = 20 * (count - len(pairs))
+        while len(pairs) < count and attempts:
+            attempts -= 1
+            add((project_choice.pick()[0], self.rng.choice(user_ids)))
+        if len(pairs) < count:
+            # Close to every user in every project: draw distinct cells of the project x user grid instead.
+            # At most len(pairs) of `count` distinct cells are taken, so this always finishes
+            for cell in self.rng.sample(range(len(project_ids) * len(user_ids)), count):
+                if len(pairs) == count:
+                    break
+                add((project_ids[cell // len(user_ids)], user_ids[cell % len(user_ids)]))
+
+        locations = WeightedChoice(self.rng, *zip(*LOCATION_WEIGHTS))
+        permissions = WeightedChoice(self.rng, *zip(*PERMISSION_WEIGHTS))
+        rows = itertools.chain(
+            (ProjectMembership(project_id=project_id, owner_id=owner, permission_level=ProjectMembership.SHARE, location=locations.pick()[0])
+                for project_id, owner in project_owners.items()),
+            (ProjectMembership(project_id=project_id, owner_id=owner, permission_level=permissions.pick()[0], location=locations.pick()[0])
+                for project_id, owner in extra),
+        )
+        self.bulk_insert(ProjectMembership, rows, count, 'Memberships')
+        return members
+
+    def create_tasks(self, count, project_choice, members):
+        statuses = WeightedChoice(self.rng, *zip(*STATUS_WEIGHTS))
+        priorities = WeightedChoice(self.rng, *zip(*PRIORITY_WEIGHTS))
+        categories = WeightedChoice(self.rng, *zip(*CATEGORY_WEIGHTS))
+
+        def rows():
+            # Draw each column a chunk at a time, per-row draws dominate the run time
+            for start in range(0, count, self.chunk_size):
+                size = min(self.chunk_size, count - start)
+                columns = zip(range(start, start + size), project_choice.pick(size), statuses.pick(size), priorities.pick(size), categories.pick(size))
+                for number, project_id, task_status, priority, category in columns:
+                    yield Task(
+                        project_id=project_id,
+                        owner_id=self.rng.choice(members[project_id]),
+                        name='Task %d' % number,
+                        description='Seeded task %d' % number,
+                        status=task_status,
+                        priority=priority,
+                        category=category,
+                    )
+
+        self.bulk_insert(Task, rows(), count, 'Tasks')
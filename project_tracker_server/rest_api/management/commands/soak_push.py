@@ -0,0 +1,117 @@
+import asyncio
+import resource
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_api.models import ProjectMembership
+from rest_api.push import PUSH_PATH, get_broker
+
+class Command(BaseCommand):
+    help = 'Hold thousands of idle server-push subscribers open against the ASGI application and time event fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to subscribe as, defaults to the user with the most memberships')
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--idle', type=float, default=30, help='Seconds to hold the subscribers idle, keepalives included')
+        parser.add_argument('--keepalive', type=float, default=5, help='Keepalive interval in seconds while idle')
+        parser.add_argument('--events', type=int, default=20, help='Events to publish to every subscribed project afterwards')
+
+    def handle(self, *args, **options):
+        from project_tracker_server import asgi
+        user = self.get_user(options['user'])
+        token, created = Token.objects.get_or_create(user=user)
+        project_ids = list(ProjectMembership.objects.filter(owner=user).order_by('project_id').values_list('project_id', flat=True)[:10])
+        try:
+            asyncio.run(self.soak(asgi, token.key, project_ids, options))
+        finally:
+            if created:
+                token.delete()
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist' % username)
+        user = User.objects.annotate(num_memberships=Count('projectMemberships')).order_by('-num_memberships').first()
+        if user is None or user.num_memberships == 0:
+            raise CommandError('No users with memberships, seed some data first')
+        return user
+
+    async def soak(self, asgi, token, project_ids, options):
+        from rest_api import push
+        push.PUSH_KEEPALIVE_SECONDS = options['keepalive']
+        broker = get_broker()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        latencies = []
+        keepalives = [0]
+        disconnect = asyncio.Event()
+
+        async def subscriber(number):
+            # Each subscriber follows one of the user's projects
+            project_id = project_ids[number % len(project_ids)]
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': PUSH_PATH, 'raw_path': PUSH_PATH.encode(), 'root_path': '',
+                'query_string': ('projects=%d' % project_id).encode(),
+                'headers': [(b'host', b'testserver'), (b'authorization', ('Token ' + token).encode())],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            statuses = []
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif message.get('body', b'').startswith(b': keepalive'):
+                    keepalives[0] += 1
+                elif message.get('body', b'').startswith(b'event: '):
+                    sent = float(message['body'].split(b'"sent": ', 1)[1].split(b'}', 1)[0])
+                    latencies.append(time.perf_counter() - sent)
+
+            await asgi.application(scope, receive, send)
+            if statuses != [200]:
+                raise CommandError('Subscriber %d got %s' % (number, statuses))
+
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber(number)) for number in range(options['subscribers'])]
+        while broker.subscriber_count() < options['subscribers']:
+            await asyncio.sleep(0.1)
+            for task in tasks:
+                if task.done() and task.exception():
+                    raise task.exception()
+        connected = time.perf_counter() - started
+        rss_connected = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write('%d subscribers connected in %.1fs, %.1f KB max RSS each' % (
+            options['subscribers'], connected, (rss_connected - rss_before) / options['subscribers']))
+
+        await asyncio.sleep(options['idle'])
+        self.stdout.write('Idle %.0fs: %d keepalives sent' % (options['idle'], keepalives[0]))
+
+        # Published from a worker thread, as signal handlers do after commit
+        def publish():
+            for number in range(options['events']):
+                for project_id in project_ids:
+                    broker.publish(project_id, {'type': 'task.updated', 'project': project_id, 'data': {}, 'sent': time.perf_counter()})
+        await asyncio.get_running_loop().run_in_executor(None, publish)
+        expected = options['events'] * options['subscribers']
+        deadline = time.perf_counter() + 30
+        while len(latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        if not latencies:
+            raise CommandError('No events delivered')
+        latencies.sort()
+        self.stdout.write('Delivered %d/%d events, p50 %.1fms, p99 %.1fms, max %.1fms' % (
+            len(latencies), expected, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000, latencies[-1] * 1000))
+        self.stdout.write('%d subscribers left after disconnecting' % broker.subscriber_count())
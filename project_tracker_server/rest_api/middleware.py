@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_api.instrumentation import SERVER_TIMING_HEADER, collect_metrics, current_metrics, log_request
+from rest_api.replicas import pin_user, replica_reads
+
+class RequestMetricsMiddleware:
+    # Count SQL queries and time each phase of a request, see rest_api/instrumentation.py
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Let Django drive this middleware natively under ASGI
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+            return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        with collect_metrics() as metrics:
+            response = await self.get_response(request)
+            return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        if hasattr(request, '_metrics_render_started'):
+            metrics.add_phase('render', time.perf_counter() - request._metrics_render_started)
+        total = metrics.total
+
+        if SERVER_TIMING_HEADER:
+            response['Server-Timing'] = metrics.server_timing(total)
+        log_request(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Tag DRF viewsets as ViewSet.action, other views by name
+        metrics = current_metrics()
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        if view_class is not None:
+            action = actions.get(request.method.lower(), request.method.lower())
+            metrics.view = '%s.%s' % (view_class.__name__, action)
+        else:
+            metrics.view = getattr(view_func, '__name__', view_func.__class__.__name__)
+        request._metrics_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and right before the response is rendered
+        now = time.perf_counter()
+        metrics = current_metrics()
+        if hasattr(request, '_metrics_view_started'):
+            metrics.add_phase('view', now - request._metrics_view_started)
+        request._metrics_render_started = now
+        return response
+
+class ReplicaMiddleware:
+    # Let safe requests read from replicas and pin writers to the primary, see rest_api/replicas.py
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS:
+            with replica_reads(request):
+                return self.get_response(request)
+        response = self.get_response(request)
+        self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS:
+            with replica_reads(request):
+                return await self.get_response(request)
+        response = await self.get_response(request)
+        self.pin(request)
+        return response
+
+    def pin(self, request):
+        # DRF has replaced the session user with the authenticated one by now
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_user(user.id)
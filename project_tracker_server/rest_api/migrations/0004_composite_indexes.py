@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-18 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0003_task_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectmembership',
+            index=models.Index(fields=['owner', 'location'], name='membership_owner_location'),
+        ),
+        migrations.AddIndex(
+            model_name='projectmembership',
+            index=models.Index(fields=['owner', 'project', 'permission_level'], name='membership_owner_project_perm'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'id'], name='task_project_id'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status'], name='task_project_status'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'priority'], name='task_project_priority'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'category'], name='task_project_category'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 07:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (Task field, value) -> counter column, as in ProjectSummary.COUNTERS at the time of this migration
+COUNTERS = {
+    ('status', 1): 'status_backlog', ('status', 2): 'status_in_progress', ('status', 3): 'status_testing', ('status', 4): 'status_completed',
+    ('priority', 1): 'priority_none', ('priority', 2): 'priority_low', ('priority', 3): 'priority_medium', ('priority', 4): 'priority_high',
+    ('category', 1): 'category_task', ('category', 2): 'category_feature', ('category', 3): 'category_bug', ('category', 4): 'category_other',
+}
+
+def create_summaries(apps, schema_editor):
+    Project = apps.get_model('rest_api', 'Project')
+    ProjectSummary = apps.get_model('rest_api', 'ProjectSummary')
+    Task = apps.get_model('rest_api', 'Task')
+
+    summaries = {project_id: ProjectSummary(project_id=project_id) for project_id in Project.objects.values_list('id', flat=True)}
+    rows = Task.objects.order_by().values('project_id', 'status', 'priority', 'category').annotate(count=models.Count('id'))
+    for row in rows:
+        summary = summaries[row['project_id']]
+        summary.total += row['count']
+        for field in ('status', 'priority', 'category'):
+            column = COUNTERS.get((field, row[field]))
+            if column is not None:
+                setattr(summary, column, getattr(summary, column) + row['count'])
+    ProjectSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSummary',
+            fields=[
+                ('project', models.OneToOneField(editable=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='rest_api.project')),
+                ('total', models.IntegerField(default=0)),
+                ('status_backlog', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_testing', models.IntegerField(default=0)),
+                ('status_completed', models.IntegerField(default=0)),
+                ('priority_none', models.IntegerField(default=0)),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('category_task', models.IntegerField(default=0)),
+                ('category_feature', models.IntegerField(default=0)),
+                ('category_bug', models.IntegerField(default=0)),
+                ('category_other', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Postgres only: a weighted tsvector over name and description, kept current by
+# a trigger so bulk_create and bulk_update are covered too, see rest_api/search.py
+
+FORWARD = [
+    "ALTER TABLE rest_api_task ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION rest_api_task_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER rest_api_task_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description ON rest_api_task
+    FOR EACH ROW EXECUTE PROCEDURE rest_api_task_search_vector()
+    """,
+    """
+    UPDATE rest_api_task SET search_vector =
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    """,
+    "CREATE INDEX task_search_vector ON rest_api_task USING GIN (search_vector)",
+]
+
+BACKWARD = [
+    "DROP INDEX IF EXISTS task_search_vector",
+    "DROP TRIGGER IF EXISTS rest_api_task_search_vector_update ON rest_api_task",
+    "DROP FUNCTION IF EXISTS rest_api_task_search_vector()",
+    "ALTER TABLE rest_api_task DROP COLUMN IF EXISTS search_vector",
+]
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0005_project_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# Postgres only: case-insensitive username prefix search for /users/search/.
+# Under the C collation a btree serves LIKE 'PREFIX%' as a range scan already
+# in the order the results are returned, see rest_api/search.py
+
+FORWARD = [
+    'CREATE INDEX user_username_prefix ON auth_user ((UPPER(username) COLLATE "C"))',
+]
+
+BACKWARD = [
+    "DROP INDEX IF EXISTS user_username_prefix",
+]
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0007_sync_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0009_purge_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='object_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='project_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='user_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rest_api', '0010_bigint_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='projectmembership',
+            name='membership_owner_project_perm',
+        ),
+        migrations.AlterField(
+            model_name='projectmembership',
+            name='owner',
+            field=models.ForeignKey(db_index=False, default=None, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='projectMemberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='projectmembership',
+            name='project',
+            field=models.ForeignKey(db_index=False, default=None, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='projectMemberships', to='rest_api.project'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='project',
+            field=models.ForeignKey(db_index=False, default=None, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='rest_api.project'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0011_drop_redundant_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purgejob',
+            name='tasks_deleted',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='purgejob',
+            name='tasks_total',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+def backfill_trashed_at(apps, schema_editor):
+    # The last change is the best estimate left of when a membership went into the trash
+    ProjectMembership = apps.get_model('rest_api', 'ProjectMembership')
+    ProjectMembership.objects.filter(location=3).update(trashed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0012_purgejob_bigint_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectmembership',
+            name='trashed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_trashed_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class Project(models.Model):
@@ -6,10 +7,18 @@ class Project(models.Model):
     description = models.TextField(max_length=200, null=False, blank=True, default='')
     
     owner = models.ForeignKey(User, null=False, blank=False, default=None, related_name='projects', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['id']
 
+    def delete(self, *args, **kwargs):
+        # The tasks go too, without per-task summary updates or tombstones, see rest_api/summary.py
+        from rest_api.summary import deleting_projects
+        with deleting_projects([self.id]):
+            return super().delete(*args, **kwargs)
+
 class ProjectMembership(models.Model):
     # Permission Levels
     SHARE = 1
@@ -29,14 +38,39 @@ class ProjectMembership(models.Model):
         (ARCHIVE, 'Archive'),
         (TRASH, 'Trash'),
     )
-    project = models.ForeignKey(Project, null=False, blank=False, default=None, related_name='projectMemberships', on_delete=models.CASCADE, editable=False)
-    owner = models.ForeignKey(User, null=False, blank=False, default=None, related_name='projectMemberships', on_delete=models.CASCADE, editable=False)
+    # Both lead composite indexes below, no separate index of their own
+    project = models.ForeignKey(Project, null=False, blank=False, default=None, related_name='projectMemberships', on_delete=models.CASCADE, editable=False, db_index=False)
+    owner = models.ForeignKey(User, null=False, blank=False, default=None, related_name='projectMemberships', on_delete=models.CASCADE, editable=False, db_index=False)
     location = models.IntegerField(choices=LOCATIONS, blank=False, null=False, default=MAIN)
     permission_level = models.IntegerField(choices=PERMISSION_LEVELS, blank=False, null=False, default=VIEW)
+    # When location last became TRASH, None outside the trash
+    trashed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['id']
         unique_together = ['project', 'owner']
+        indexes = [
+            # Project lists by location
+            models.Index(fields=['owner', 'location'], name='membership_owner_location'),
+            # Delta sync, see rest_api/sync.py
+            models.Index(fields=['project', 'updated_at'], name='membership_project_updated'),
+        ]
+
+    def update_trashed_at(self, now=None):
+        # Keep trashed_at in step with location, see rest_api/purge.py
+        if self.location != self.TRASH:
+            self.trashed_at = None
+        elif self.trashed_at is None:
+            self.trashed_at = now or timezone.now()
+
+    def save(self, *args, **kwargs):
+        self.update_trashed_at()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'location' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'trashed_at'}
+        super().save(*args, **kwargs)
 
 class Task(models.Model):
     # Categories
@@ -73,13 +107,125 @@ class Task(models.Model):
         (COMPLETED, 'Completed'),
     )
 
-    project = models.ForeignKey(Project, null=False, blank=False, default=None, related_name='tasks', on_delete=models.CASCADE, editable=False)
+    # Leads every index in Meta, no separate index of its own
+    project = models.ForeignKey(Project, null=False, blank=False, default=None, related_name='tasks', on_delete=models.CASCADE, editable=False, db_index=False)
     owner = models.ForeignKey(User, null=False, blank=False, default=None, related_name='tasks', on_delete=models.CASCADE)
     name = models.TextField(max_length=200, null=False, blank=True, default='')
     description = models.TextField(max_length=200, null=False, blank=True, default='')
     category = models.IntegerField(choices=CATEGORIES, null=False, blank=False, default=TASK)
     priority = models.IntegerField(choices=PRIORITY_LEVELS, blank=False, null=False, default=Wishlist)
     status = models.IntegerField(choices=STATUSES, blank=False, null=False, default=BACKLOG)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Task lists are always scoped to projects, then filtered and ordered
+            models.Index(fields=['project', 'id'], name='task_project_id'),
+            models.Index(fields=['project', 'status'], name='task_project_status'),
+            models.Index(fields=['project', 'priority'], name='task_project_priority'),
+            models.Index(fields=['project', 'category'], name='task_project_category'),
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The post_save receiver updates ProjectSummary, keep both writes in one transaction
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+class ProjectSummary(models.Model):
+    # Task counts per project, maintained incrementally by rest_api/summary.py
+    project = models.OneToOneField(Project, primary_key=True, related_name='summary', on_delete=models.CASCADE, editable=False)
+    total = models.IntegerField(null=False, default=0)
+    status_backlog = models.IntegerField(null=False, default=0)
+    status_in_progress = models.IntegerField(null=False, default=0)
+    status_testing = models.IntegerField(null=False, default=0)
+    status_completed = models.IntegerField(null=False, default=0)
+    priority_none = models.IntegerField(null=False, default=0)
+    priority_low = models.IntegerField(null=False, default=0)
+    priority_medium = models.IntegerField(null=False, default=0)
+    priority_high = models.IntegerField(null=False, default=0)
+    category_task = models.IntegerField(null=False, default=0)
+    category_feature = models.IntegerField(null=False, default=0)
+    category_bug = models.IntegerField(null=False, default=0)
+    category_other = models.IntegerField(null=False, default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+
+    # (Task field, value) -> counter column
+    COUNTERS = {
+        ('status', Task.BACKLOG): 'status_backlog',
+        ('status', Task.IN_PROGRESS): 'status_in_progress',
+        ('status', Task.TESTING): 'status_testing',
+        ('status', Task.COMPLETED): 'status_completed',
+        ('priority', Task.Wishlist): 'priority_none',
+        ('priority', Task.LOW): 'priority_low',
+        ('priority', Task.MEDIUM): 'priority_medium',
+        ('priority', Task.HIGH): 'priority_high',
+        ('category', Task.TASK): 'category_task',
+        ('category', Task.FEATURE): 'category_feature',
+        ('category', Task.BUGFIX): 'category_bug',
+        ('category', Task.OTHER): 'category_other',
+    }
+
+class Tombstone(models.Model):
+    # A deleted membership or task, kept for delta sync clients, see rest_api/sync.py
+    # Deleted projects show up as the deletion of each member's membership
+    MEMBERSHIP = 1
+    TASK = 2
+    KINDS = (
+        (MEMBERSHIP, 'Membership'),
+        (TASK, 'Task'),
+    )
+    kind = models.IntegerField(choices=KINDS, null=False, blank=False)
+    # Ids of BigAutoField keys
+    object_id = models.BigIntegerField(null=False, blank=False)
+    # Project the object belonged to, and for memberships the user who lost access
+    project_id = models.BigIntegerField(null=False, blank=False)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['project_id', 'deleted_at'], name='tombstone_project_deleted'),
+            models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted'),
+        ]
+
+class PurgeJob(models.Model):
+    # A project queued for deletion in the background, see rest_api/purge.py
+    # The project is hidden from everyone while its job exists
+    DELETED = 1
+    TRASH_EXPIRED = 2
+    REASONS = (
+        (DELETED, 'Deleted'),
+        (TRASH_EXPIRED, 'Trash expired'),
+    )
+    PENDING = 1
+    RUNNING = 2
+    DONE = 3
+    FAILED = 4
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    # Outlives the project, so no database constraint
+    project = models.OneToOneField(Project, related_name='purge', on_delete=models.DO_NOTHING, db_constraint=False, editable=False)
+    reason = models.IntegerField(choices=REASONS, null=False, blank=False)
+    status = models.IntegerField(choices=STATUSES, null=False, default=PENDING)
+    tasks_total = models.BigIntegerField(null=True, blank=True)
+    tasks_deleted = models.BigIntegerField(null=False, default=0)
+    error = models.TextField(null=False, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Doubles as the worker's heartbeat
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='purge_status'),
+        ]
@@ -0,0 +1,189 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Pagination
+#
+# Page number pagination stays the default. `?count=false` skips the COUNT(*)
+# in either mode, and passing `?cursor=` (empty for the first page) switches a
+# view to keyset pagination, which never scans past the rows it returns.
+
+def _include_count(request):
+    return request.query_params.get('count', 'true').lower() not in ('false', '0')
+
+class PageNumberCountPagination(PageNumberPagination):
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.include_count = _include_count(request)
+        if self.include_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        # Fetch one extra row to tell whether there is a next page without counting
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound('Invalid page.')
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.include_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.include_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if self.include_count:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.include_count = _include_count(request)
+        self.keys = self.get_keys(request, view)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        if self.include_count:
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_position = self.get_position(rows[0]) if rows else None
+        self.last_position = self.get_position(rows[-1]) if rows else None
+        if not rows and position is not None:
+            # Empty page past either end, point back at where we came from
+            self.first_position = self.last_position = position
+        return rows
+
+    def get_keys(self, request, view):
+        # [(field, descending)], always ending on the unique id
+        allowed = getattr(view, 'cursor_ordering_fields', ('id',))
+        ordering = request.query_params.get(self.ordering_query_param, 'id')
+        field = ordering.lstrip('-')
+        if field not in allowed:
+            ordering, field = 'id', 'id'
+        descending = ordering.startswith('-')
+
+        keys = [(field, descending)]
+        if field != 'id':
+            keys.append(('id', descending))
+        return keys
+
+    def get_order_by(self, reverse):
+        return [('-' if descending != reverse else '') + field for field, descending in self.keys]
+
+    def get_position_filter(self, position, reverse):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per key direction
+        condition = Q()
+        for index in reversed(range(len(self.keys))):
+            field, descending = self.keys[index]
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{'%s__%s' % (field, lookup): position[index]})
+            if index < len(self.keys) - 1:
+                step |= Q(**{field: position[index]}) & condition
+            condition = step
+        return condition
+
+    def get_position(self, row):
+        # Model instances, or .values() rows from ValuesListMixin
+        if isinstance(row, dict):
+            return [row[field] for field, descending in self.keys]
+        return [getattr(row, field) for field, descending in self.keys]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            position, reverse = cursor['p'], bool(cursor['r'])
+            if not isinstance(position, list) or len(position) != len(self.keys):
+                raise ValueError
+            # Cursors come from the client, check each value against its field
+            position = [model._meta.get_field(field).to_python(value) for (field, descending), value in zip(self.keys, position)]
+            if None in position:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound('Invalid cursor')
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(cursor.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.include_count:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+class KeysetPaginationMixin:
+    # Views opt into keyset pagination per request by passing `?cursor=`
+    cursor_ordering_fields = ('id',)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and KeysetPagination.cursor_query_param in self.request.query_params:
+            self._paginator = KeysetPagination()
+        return super().paginator
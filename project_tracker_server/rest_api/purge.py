@@ -0,0 +1,126 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_api.cache import invalidate_project, invalidate_user
+from rest_api.models import Project, ProjectMembership, ProjectSummary, PurgeJob, Task
+from rest_api.summary import deleting_projects
+
+logger = logging.getLogger(__name__)
+
+# Background deletion of large and long-trashed projects
+#
+# Deleting a project through the ORM loads every task and membership to
+# cascade, inside the request. Projects with more than PURGE_TASK_THRESHOLD
+# tasks get a PurgeJob instead. The request removes the memberships, so
+# members get their tombstones, push events and ACL updates as usual, and the
+# job hides the project from the ACL and ProjectViewSet. `manage.py
+# purge_projects` then deletes the tasks in bounded raw batches, without
+# loading them or sending per-row signals, and finally the project itself.
+# Projects their owner left in the trash for PROJECT_TRASH_RETENTION_DAYS,
+# counted from the membership's trashed_at, are queued the same way. The
+# owner's trash decides for everyone: once queued the project disappears for
+# its other members too, wherever they kept it, as it would had the owner
+# deleted it. Their memberships stay until the worker runs.
+
+PURGE_TASK_THRESHOLD = getattr(settings, 'PURGE_TASK_THRESHOLD', 1000)
+PURGE_BATCH_SIZE = getattr(settings, 'PURGE_BATCH_SIZE', 2000)
+PROJECT_TRASH_RETENTION = timedelta(days=getattr(settings, 'PROJECT_TRASH_RETENTION_DAYS', 30))
+# A running job not heard from for this long is assumed to have lost its worker
+PURGE_STALE_AFTER = timedelta(minutes=10)
+
+def _task_count(project):
+    total = ProjectSummary.objects.filter(project_id=project.id).values_list('total', flat=True).first()
+    return total if total is not None else Task.objects.filter(project_id=project.id).count()
+
+def queue_purge(project, reason):
+    # Hide the project and hand it to the purge worker
+    with transaction.atomic():
+        job, created = PurgeJob.objects.get_or_create(project_id=project.id, defaults={'reason': reason})
+        member_ids = list(ProjectMembership.objects.filter(project_id=project.id).values_list('owner_id', flat=True))
+        if reason == PurgeJob.DELETED:
+            # Members lose access now, as they would with a plain delete
+            ProjectMembership.objects.filter(project_id=project.id).delete()
+        for user_id in set(member_ids) | {project.owner_id}:
+            invalidate_user(user_id)
+        invalidate_project(project.id)
+    return job
+
+def delete_project(project):
+    # Deletes small projects right away and returns None, queues the rest and returns their PurgeJob
+    if _task_count(project) <= PURGE_TASK_THRESHOLD:
+        project.delete()
+        return None
+    return queue_purge(project, PurgeJob.DELETED)
+
+def queue_expired_trash(now=None):
+    # Queue projects whose owner moved them to the trash more than PROJECT_TRASH_RETENTION ago
+    cutoff = (now or timezone.now()) - PROJECT_TRASH_RETENTION
+    projects = Project.objects.filter(
+        purge__isnull=True,
+        projectMemberships__owner=F('owner'),
+        projectMemberships__location=ProjectMembership.TRASH,
+        projectMemberships__trashed_at__lt=cutoff,
+    )
+    queued = 0
+    for project in projects.order_by('id'):
+        queue_purge(project, PurgeJob.TRASH_EXPIRED)
+        queued += 1
+    return queued
+
+def claim_job(now=None):
+    # Take the oldest pending or abandoned job, safe against other workers
+    now = now or timezone.now()
+    candidates = PurgeJob.objects.filter(
+        Q(status=PurgeJob.PENDING) | Q(status=PurgeJob.RUNNING, updated_at__lt=now - PURGE_STALE_AFTER)
+    ).order_by('id')
+    for job in candidates[:10]:
+        claimed = PurgeJob.objects.filter(id=job.id, status=job.status, updated_at=job.updated_at).update(status=PurgeJob.RUNNING, updated_at=now)
+        if claimed:
+            job.status, job.updated_at = PurgeJob.RUNNING, now
+            return job
+    return None
+
+def run_job(job, batch_size=PURGE_BATCH_SIZE, progress=None):
+    # Purge the job's project, calling progress(job) after every batch. Returns whether it succeeded
+    try:
+        if job.tasks_total is None:
+            job.tasks_total = Task.objects.filter(project_id=job.project_id).count()
+            job.save(update_fields=['tasks_total', 'updated_at'])
+
+        # Through the ORM, members need their tombstones and push events
+        while True:
+            ids = list(ProjectMembership.objects.filter(project_id=job.project_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            ProjectMembership.objects.filter(id__in=ids).delete()
+
+        # Nothing references tasks and nobody can see them any more, skip the collector and signals
+        while True:
+            ids = list(Task.objects.filter(project_id=job.project_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            tasks = Task.objects.filter(id__in=ids)
+            job.tasks_deleted += tasks._raw_delete(tasks.db)
+            # Also the heartbeat that keeps other workers off the job
+            job.save(update_fields=['tasks_deleted', 'updated_at'])
+            if progress is not None:
+                progress(job)
+
+        # Only the summary left to cascade to
+        with deleting_projects([job.project_id]):
+            Project.objects.filter(id=job.project_id).delete()
+        job.status = PurgeJob.DONE
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+        return True
+    except Exception:
+        logger.exception('Purging project %d failed', job.project_id)
+        job.status = PurgeJob.FAILED
+        job.error = traceback.format_exc()
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return False
@@ -0,0 +1,329 @@
+import asyncio
+import functools
+import json
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_api.acl import PermissionContext
+from rest_api.authentication import CachedTokenAuthentication
+from rest_api.models import ProjectMembership
+from rest_api.serializers import ProjectMembershipSerializer, TaskSerializer
+
+# Server push of task and membership changes
+#
+# Clients open GET /events/?projects=1,2 as server-sent events, or the same
+# path as a WebSocket, authenticated with their API token (Authorization
+# header, or ?token= where the client can't set headers). Every project needs
+# view permission, as for GET /tasks/?project=N. Changes are published once
+# their transaction commits and fanned out by a broker; PUSH_BROKER picks the
+# implementation. InMemoryBroker only reaches subscribers in its own process,
+# multi-node deployments need one backed by a shared pub/sub.
+#
+# Permissions are checked again whenever the subscriber's ACL is invalidated:
+# projects they can no longer view, e.g. once queued for purging, stop
+# streaming, and the stream ends when none are left.
+
+PUSH_PATH = getattr(settings, 'PUSH_PATH', '/events/')
+PUSH_BROKER = getattr(settings, 'PUSH_BROKER', 'rest_api.push.InMemoryBroker')
+PUSH_QUEUE_SIZE = getattr(settings, 'PUSH_QUEUE_SIZE', 100)
+PUSH_KEEPALIVE_SECONDS = getattr(settings, 'PUSH_KEEPALIVE_SECONDS', 15)
+MAX_PROJECTS_PER_SUBSCRIPTION = 100
+
+# Sent in place of events a subscriber fell too far behind on, it should resync and reconnect
+RESYNC = {'type': 'resync'}
+# Queued when the subscriber's ACL changed, never sent
+RECHECK = {'type': 'recheck'}
+
+class Subscription:
+    # One client's queue of events, read on the event loop it subscribed from
+
+    def __init__(self, broker, user_id, project_ids, loop, queue_size):
+        self.broker = broker
+        self.user_id = user_id
+        self.project_ids = set(project_ids)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Called on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def revoke(self, project_ids):
+        # Stop sending these projects, returns whether none are left
+        self.broker.unsubscribe(self, list(project_ids))
+        self.project_ids.difference_update(project_ids)
+        return not self.project_ids
+
+    def revoked(self, event):
+        # The subscriber's own membership went away, stop sending that project
+        if event['type'] == 'membership.deleted' and event.get('user') == self.user_id:
+            return self.revoke([event['project']])
+        return not self.project_ids
+
+    def close(self):
+        self.broker.unsubscribe(self, list(self.project_ids))
+
+class BaseBroker(ABC):
+
+    @abstractmethod
+    def subscribe(self, user_id, project_ids):
+        # Called on the subscriber's event loop, returns a Subscription
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription, project_ids):
+        ...
+
+    @abstractmethod
+    def publish(self, project_id, event):
+        # Called from any thread once the change has committed
+        ...
+
+    @abstractmethod
+    def recheck(self, user_id):
+        # Called from any thread once the user's ACL changed, queues RECHECK on each of their subscriptions
+        ...
+
+    def has_subscribers(self, project_id):
+        # Lets publishers skip serializing events nobody listens to
+        return True
+
+class InMemoryBroker(BaseBroker):
+    # Fan-out within one process, for single-node runs and tests
+
+    def __init__(self, queue_size=PUSH_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, user_id, project_ids):
+        subscription = Subscription(self, user_id, project_ids, asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            for project_id in subscription.project_ids:
+                self.subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription, project_ids):
+        with self.lock:
+            for project_id in project_ids:
+                subscribers = self.subscribers.get(project_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[project_id]
+
+    def publish(self, project_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(project_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription, [project_id])
+
+    def recheck(self, user_id):
+        with self.lock:
+            subscribers = {subscription for subscriptions in self.subscribers.values() for subscription in subscriptions if subscription.user_id == user_id}
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, RECHECK)
+            except RuntimeError:
+                subscription.close()
+
+    def has_subscribers(self, project_id):
+        return project_id in self.subscribers
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(set().union(*self.subscribers.values())) if self.subscribers else 0
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    return import_string(PUSH_BROKER)()
+
+# Publishing, from rest_api/signals.py and rest_api/bulk.py
+
+def publish(event_type, project_id, data, **fields):
+    broker = get_broker()
+    if not broker.has_subscribers(project_id):
+        return
+    event = dict(type=event_type, project=project_id, data=data, **fields)
+    transaction.on_commit(lambda: broker.publish(project_id, event))
+
+def publish_task(task, created=False, previous_project_id=None):
+    if previous_project_id is not None and previous_project_id != task.project_id:
+        # Gone from the old project's boards
+        publish('task.deleted', previous_project_id, {'id': task.id})
+        created = True
+    if get_broker().has_subscribers(task.project_id):
+        publish('task.created' if created else 'task.updated', task.project_id, TaskSerializer(task).data)
+
+def publish_task_deleted(task):
+    publish('task.deleted', task.project_id, {'id': task.id})
+
+def publish_membership(membership, created=False):
+    if get_broker().has_subscribers(membership.project_id):
+        publish('membership.created' if created else 'membership.updated', membership.project_id,
+                ProjectMembershipSerializer(membership).data, user=membership.owner_id)
+
+def publish_membership_deleted(membership):
+    publish('membership.deleted', membership.project_id, {'id': membership.id}, user=membership.owner_id)
+
+# ASGI endpoint, routed to by project_tracker_server/asgi.py
+
+class PushRefused(Exception):
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _parse(scope):
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    headers = dict(scope.get('headers', ()))
+    token = query.get('token', [''])[0]
+    authorization = headers.get(b'authorization', b'').decode('latin1').split()
+    if len(authorization) == 2 and authorization[0].lower() == 'token':
+        token = authorization[1]
+    try:
+        project_ids = sorted({int(project_id) for value in query.get('projects', []) for project_id in value.split(',') if project_id})
+    except ValueError:
+        raise PushRefused(400, 'projects must be a comma separated list of ids.')
+    if not project_ids or len(project_ids) > MAX_PROJECTS_PER_SUBSCRIPTION:
+        raise PushRefused(400, 'Subscribe to between 1 and %d projects.' % MAX_PROJECTS_PER_SUBSCRIPTION)
+    return token, project_ids
+
+@sync_to_async
+def _authorize(token, project_ids):
+    # Same credentials and read rule as GET /tasks/?project=N
+    if not token:
+        raise PushRefused(401, 'Authentication credentials were not provided.')
+    try:
+        user, auth_token = CachedTokenAuthentication().authenticate_credentials(token)
+    except AuthenticationFailed as error:
+        raise PushRefused(401, str(error.detail))
+    context = PermissionContext(user)
+    if not all(context.has_level(project_id, ProjectMembership.VIEW) for project_id in project_ids):
+        raise PushRefused(403, 'You do not have permission to view one of these projects.')
+    return user
+
+@sync_to_async
+def _lost_access(user_id, project_ids):
+    # Subscribed projects the user can't view any more
+    context = PermissionContext(User(id=user_id))
+    return [project_id for project_id in project_ids if not context.has_level(project_id, ProjectMembership.VIEW)]
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] in ('http.disconnect', 'websocket.disconnect'):
+            return
+
+async def _stream(subscription, receive, emit, keepalive):
+    # Send events until the client leaves (returns True) or the subscription ends (False)
+    keepalive = keepalive or PUSH_KEEPALIVE_SECONDS
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    next_event = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, pending = await asyncio.wait({next_event, disconnect}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                return True
+            if next_event not in done:
+                await emit(None)
+                continue
+            event = next_event.result()
+            if event is RECHECK:
+                # Events already queued, like the membership.deleted behind a removal, still go out
+                if subscription.revoke(await _lost_access(subscription.user_id, list(subscription.project_ids))) and subscription.queue.empty():
+                    return False
+                next_event = asyncio.ensure_future(subscription.get())
+                continue
+            await emit(event)
+            if event is RESYNC or subscription.revoked(event):
+                return False
+            next_event = asyncio.ensure_future(subscription.get())
+    finally:
+        next_event.cancel()
+        disconnect.cancel()
+        subscription.close()
+
+def _encode(event):
+    return json.dumps(event, cls=JSONEncoder)
+
+async def push_endpoint(scope, receive, send, keepalive=None):
+    if scope['type'] == 'websocket':
+        return await websocket_endpoint(scope, receive, send, keepalive)
+    return await sse_endpoint(scope, receive, send, keepalive)
+
+async def sse_endpoint(scope, receive, send, keepalive=None):
+    try:
+        token, project_ids = _parse(scope)
+        user = await _authorize(token, project_ids)
+    except PushRefused as refused:
+        body = json.dumps({'detail': refused.detail}).encode()
+        await send({'type': 'http.response.start', 'status': refused.status_code, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    subscription = get_broker().subscribe(user.id, project_ids)
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    await send({'type': 'http.response.body', 'body': b': subscribed\n\n', 'more_body': True})
+
+    async def emit(event):
+        if event is None:
+            body = b': keepalive\n\n'
+        else:
+            body = ('event: %s\ndata: %s\n\n' % (event['type'], _encode(event))).encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    if not await _stream(subscription, receive, emit, keepalive):
+        await send({'type': 'http.response.body', 'body': b''})
+
+async def websocket_endpoint(scope, receive, send, keepalive=None):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    try:
+        token, project_ids = _parse(scope)
+        user = await _authorize(token, project_ids)
+    except PushRefused as refused:
+        # 4xxx close codes mirror the HTTP status
+        await send({'type': 'websocket.close', 'code': 4000 + refused.status_code})
+        return
+
+    subscription = get_broker().subscribe(user.id, project_ids)
+    await send({'type': 'websocket.accept'})
+
+    async def emit(event):
+        # WebSocket servers keep idle connections alive with protocol pings
+        if event is not None:
+            await send({'type': 'websocket.send', 'text': _encode(event)})
+
+    if not await _stream(subscription, receive, emit, keepalive):
+        await send({'type': 'websocket.close', 'code': 1000})
@@ -0,0 +1,107 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from rest_api.cache import cache_shared
+
+# Read replica routing
+#
+# ReplicaRouter sends reads made while serving a GET, HEAD or OPTIONS request
+# to one of DATABASE_REPLICAS. Everything else reads from the primary:
+# writes, reads during unsafe requests, management commands and signal
+# handlers. Reads stay on the primary until DRF has authenticated the
+# request, and for REPLICA_PIN_SECONDS after the same user last sent a write,
+# so a user always sees their own changes despite replication lag. Anything
+# that writes mid-request moves the rest of that request's reads to the
+# primary too. ReplicaMiddleware in rest_api/middleware.py drives both.
+
+PRIMARY = 'default'
+REPLICA_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+REPLICA_PIN_CACHE = 'default'
+
+_current = contextvars.ContextVar('replica_routing', default=None)
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+def _pin_key(user_id):
+    return 'replica_pin:%d' % user_id
+
+def pin_user(user_id):
+    # Keep the user's reads on the primary while their write replicates
+    if _replicas():
+        caches[REPLICA_PIN_CACHE].set(_pin_key(user_id), True, timeout=REPLICA_PIN_SECONDS)
+
+def is_pinned(user_id):
+    return bool(caches[REPLICA_PIN_CACHE].get(_pin_key(user_id)))
+
+class ReplicaReads:
+    # One safe request's routing state
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.wrote = False
+
+    def alias(self):
+        if self.wrote:
+            return PRIMARY
+        if self.replica is None:
+            user = getattr(self.request, 'user', None)
+            if user is None or isinstance(user, SimpleLazyObject):
+                # Not authenticated by DRF yet, its own lookups read the primary
+                return PRIMARY
+            if user.is_authenticated and is_pinned(user.id):
+                self.replica = PRIMARY
+            else:
+                # One replica for the whole request, so its reads are consistent with each other
+                self.replica = random.choice(_replicas())
+        return self.replica
+
+def read_primary():
+    # Keep the rest of the current request's reads on the primary
+    reads = _current.get()
+    if reads is not None:
+        reads.replica = PRIMARY
+
+def replica_used():
+    # Whether the current request has read from a replica, which may lag behind the primary
+    reads = _current.get()
+    return reads is not None and reads.replica not in (None, PRIMARY)
+
+@contextmanager
+def replica_reads(request):
+    # Allow the enclosed safe request's reads to go to a replica
+    if not _replicas() or not cache_shared():
+        # Pins set by other workers wouldn't be seen, keep every read on the primary
+        yield
+        return
+    token = _current.set(ReplicaReads(request))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        reads = _current.get()
+        if reads is None:
+            return PRIMARY
+        return reads.alias()
+
+    def db_for_write(self, model, **hints):
+        reads = _current.get()
+        if reads is not None:
+            reads.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in _replicas()
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import BooleanField, Exists, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Collate, Upper
+from rest_api.models import ProjectMembership
+
+# Task search over name and description
+#
+# On Postgres, rest_api_task.search_vector holds a weighted tsvector (name A,
+# description B) maintained by a trigger and backed by a GIN index, see
+# migration 0006. It isn't a model field, so the ORM never reads or writes it.
+# Other backends fall back to case-insensitive substring matching of every
+# word, which is enough for tests and local runs.
+
+SEARCH_CONFIG = 'english'
+MAX_QUERY_LENGTH = 200
+
+def _is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+def search_tasks(queryset, query):
+    query = query.strip()[:MAX_QUERY_LENGTH]
+    if not query:
+        return queryset
+
+    if _is_postgres(queryset):
+        tsquery = "plainto_tsquery('%s', %%s)" % SEARCH_CONFIG
+        return queryset.annotate(
+            search_match=RawSQL('rest_api_task.search_vector @@ ' + tsquery, (query,), output_field=BooleanField()),
+            search_rank=RawSQL('ts_rank(rest_api_task.search_vector, %s)' % tsquery, (query,), output_field=FloatField()),
+        ).filter(search_match=True).order_by('-search_rank', 'id')
+
+    condition = Q()
+    for word in query.split():
+        condition &= Q(name__icontains=word) | Q(description__icontains=word)
+    return queryset.filter(condition)
+
+# Username prefix search, for picking who to share a project with
+#
+# Matches are case-insensitive and ordered by the upper-cased username. On
+# Postgres that expression, under the C collation, is exactly the index from
+# migration 0008, so a query reads only the rows it returns.
+
+USERNAME_MAX_LENGTH = 150
+
+def search_users(query, limit, exclude_project_id=None):
+    prefix = query.strip()[:USERNAME_MAX_LENGTH].upper()
+    users = User.objects.filter(is_active=True)
+    if not prefix:
+        return users.none()
+
+    key = Upper('username')
+    if _is_postgres(users):
+        key = Collate(key, 'C')
+    users = users.annotate(username_key=key).filter(username_key__startswith=prefix)
+    if exclude_project_id is not None:
+        # People already on the project
+        users = users.exclude(Exists(ProjectMembership.objects.filter(project_id=exclude_project_id, owner=OuterRef('pk'))))
+    return users.order_by('username_key')[:limit]
@@ -1,51 +1,68 @@
 from rest_api.models import Project, ProjectMembership, Task
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_api.instrumentation import timed
+from rest_api.sparse import SparseFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+class TimedSerializerMixin:
+    # Report serialization time to the request metrics
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = User
         fields = ['username']
+        list_serializer_class = TimedListSerializer
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.SlugRelatedField(queryset=User.objects.all(), slug_field='username', required=False)
-    membership = serializers.SerializerMethodField()
-    permission_level = serializers.SerializerMethodField()
-    location = serializers.SerializerMethodField()
+    # Annotated onto the queryset by ProjectViewSet for the requesting user
+    membership = serializers.ReadOnlyField()
+    permission_level = serializers.ReadOnlyField()
+    location = serializers.ReadOnlyField()
 
     class Meta:
         model = Project
         fields = ('__all__')
-
-    def get_membership(self, obj):
-        return ProjectMembership.objects.filter(project=obj, owner=self.context['request'].user).last().id
-
-    def get_permission_level(self, obj):
-        return ProjectMembership.objects.filter(project=obj, owner=self.context['request'].user).last().permission_level
-
-    def get_location(self, obj):
-        return ProjectMembership.objects.filter(project=obj, owner=self.context['request'].user).last().location
+        list_serializer_class = TimedListSerializer
 
     # Create a Project Membership with maximum permissions on Project creation
     def create(self, validated_data):
         project = super().create(validated_data=validated_data)
-        ProjectMembership.objects.create(owner=self.context['request'].user, project=project, permission_level=1)
+        membership = ProjectMembership.objects.create(owner=self.context['request'].user, project=project, permission_level=1)
+        # Mirror the annotations a freshly fetched project would carry
+        project.membership = membership.id
+        project.permission_level = membership.permission_level
+        project.location = membership.location
         return project
 
-class ProjectMembershipSerializer(serializers.ModelSerializer):
+class ProjectMembershipSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.SlugRelatedField(queryset=User.objects.all(), slug_field='username', required=False)
     project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
 
     class Meta:
         model = ProjectMembership
         fields = ('__all__')
+        list_serializer_class = TimedListSerializer
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.SlugRelatedField(queryset=User.objects.all(), slug_field='username', required=False)
     project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
 
     class Meta:
         model = Task
-        fields = ('__all__')        
+        fields = ('__all__')
+        list_serializer_class = TimedListSerializer        
 
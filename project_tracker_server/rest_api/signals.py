@@ -0,0 +1,157 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from rest_api.authentication import invalidate_token, invalidate_user_tokens
+from rest_api.cache import acl_invalidated, invalidate_project, invalidate_user
+from rest_api.models import Project, ProjectMembership, ProjectSummary, Task, Tombstone
+from rest_api.push import get_broker, publish_membership, publish_membership_deleted, publish_task, publish_task_deleted
+from rest_api.summary import is_project_deleting, rebuild_summaries, record_change, task_state
+
+# ACL cache invalidation
+
+@receiver(post_save, sender=ProjectMembership)
+@receiver(post_delete, sender=ProjectMembership)
+def invalidate_membership_owner(sender, instance, **kwargs):
+    invalidate_user(instance.owner_id)
+
+@receiver(post_init, sender=Project)
+def remember_project_owner(sender, instance, **kwargs):
+    # Ownership transfers change the ACL of the previous owner as well
+    instance._previous_owner_id = instance.__dict__.get('owner_id')
+
+@receiver(post_save, sender=Project)
+def invalidate_project_owner(sender, instance, created, **kwargs):
+    invalidate_project(instance.id)
+    invalidate_user(instance.owner_id)
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if previous_owner_id is not None and previous_owner_id != instance.owner_id:
+        invalidate_user(previous_owner_id)
+    instance._previous_owner_id = instance.owner_id
+
+@receiver(post_delete, sender=Project)
+def invalidate_deleted_project_owner(sender, instance, **kwargs):
+    # Members are invalidated by the cascaded membership deletes
+    invalidate_project(instance.id)
+    invalidate_user(instance.owner_id)
+
+# Push events, see rest_api/push.py
+# Registered before the receivers below, which reset _previous_project_id
+
+@receiver(post_save, sender=Task)
+def push_task(sender, instance, created, **kwargs):
+    publish_task(instance, created=created, previous_project_id=getattr(instance, '_previous_project_id', None))
+
+@receiver(post_delete, sender=Task)
+def push_deleted_task(sender, instance, **kwargs):
+    publish_task_deleted(instance)
+
+@receiver(post_save, sender=ProjectMembership)
+def push_membership(sender, instance, created, **kwargs):
+    publish_membership(instance, created=created)
+
+@receiver(post_delete, sender=ProjectMembership)
+def push_deleted_membership(sender, instance, **kwargs):
+    publish_membership_deleted(instance)
+
+@receiver(acl_invalidated)
+def recheck_push_subscriptions(sender, user_id, **kwargs):
+    get_broker().recheck(user_id)
+
+# Tombstones for delta sync, see rest_api/sync.py
+# Also registered before the receivers that reset _previous_project_id
+
+@receiver(post_delete, sender=ProjectMembership)
+def record_deleted_membership(sender, instance, **kwargs):
+    Tombstone.objects.create(kind=Tombstone.MEMBERSHIP, object_id=instance.id, project_id=instance.project_id, user_id=instance.owner_id)
+
+@receiver(post_delete, sender=Task)
+def record_deleted_task(sender, instance, **kwargs):
+    # Tasks of a deleted project go with it, members learn from their membership's tombstone
+    if not is_project_deleting(instance.project_id):
+        Tombstone.objects.create(kind=Tombstone.TASK, object_id=instance.id, project_id=instance.project_id)
+
+@receiver(post_save, sender=Task)
+def record_moved_task(sender, instance, created, **kwargs):
+    # Gone from the old project, for members who can't see the new one
+    previous_project_id = getattr(instance, '_previous_project_id', None)
+    if not created and previous_project_id is not None and previous_project_id != instance.project_id:
+        Tombstone.objects.create(kind=Tombstone.TASK, object_id=instance.id, project_id=previous_project_id)
+
+# Project version bumps for task changes, see rest_api/etags.py
+
+@receiver(post_init, sender=Task)
+def remember_task_project(sender, instance, **kwargs):
+    # Moving a task changes both the old and the new project
+    instance._previous_project_id = instance.__dict__.get('project_id')
+
+@receiver(post_save, sender=Task)
+def invalidate_task_project(sender, instance, **kwargs):
+    invalidate_project(instance.project_id)
+    previous_project_id = getattr(instance, '_previous_project_id', None)
+    if previous_project_id is not None and previous_project_id != instance.project_id:
+        invalidate_project(previous_project_id)
+    instance._previous_project_id = instance.project_id
+
+@receiver(post_delete, sender=Task)
+def invalidate_deleted_task_project(sender, instance, **kwargs):
+    invalidate_project(instance.project_id)
+
+# Project summaries, see rest_api/summary.py
+
+@receiver(post_save, sender=Project)
+def create_project_summary(sender, instance, created, **kwargs):
+    if created:
+        ProjectSummary.objects.get_or_create(project_id=instance.id)
+
+@receiver(post_init, sender=Task)
+def remember_task_state(sender, instance, **kwargs):
+    instance._summary_state = task_state(instance)
+
+@receiver(post_save, sender=Task)
+def update_task_summary(sender, instance, created, **kwargs):
+    # Runs inside Task.save's transaction
+    before = None if created else instance._summary_state
+    after = task_state(instance)
+    if before is not None and None in before:
+        # Loaded with deferred fields, the previous counters are unknown
+        rebuild_summaries({before[0], instance.project_id} - {None})
+    else:
+        record_change(before, after)
+    instance._summary_state = after
+
+@receiver(post_delete, sender=Task)
+def update_deleted_task_summary(sender, instance, **kwargs):
+    before = instance._summary_state
+    if None in before:
+        rebuild_summaries({before[0]} - {None})
+    else:
+        record_change(before, None)
+
+# Project version bumps for renamed users, lists show owners by username
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._previous_username = instance.__dict__.get('username')
+
+@receiver(post_save, sender=User)
+def invalidate_renamed_owner_projects(sender, instance, created, **kwargs):
+    previous_username = getattr(instance, '_previous_username', None)
+    if not created and previous_username is not None and previous_username != instance.username:
+        project_ids = set(Project.objects.filter(owner=instance).values_list('id', flat=True))
+        project_ids.update(Task.objects.filter(owner=instance).order_by().values_list('project_id', flat=True).distinct())
+        for project_id in project_ids:
+            invalidate_project(project_id)
+    instance._previous_username = instance.username
+
+# Token cache invalidation
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_changed_user_tokens(sender, instance, **kwargs):
+    # Deactivation, password changes and renames must not be served from the cache
+    invalidate_user_tokens(instance.id)
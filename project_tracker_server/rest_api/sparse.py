@@ -0,0 +1,133 @@
+from django.utils.timezone import is_aware
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_api.instrumentation import timed
+
+# Sparse fieldsets and the values() list path
+#
+# `?fields=id,name,status` limits GET responses to those fields. List views
+# with ValuesListMixin fetch only the columns the requested fields read, as
+# plain .values() rows, and build each result dict straight from the row. The
+# serializer's fields are still the definition of the output: a plan of
+# (name, column, conversion) is derived from them once per serializer class,
+# so no model instances or field objects are created per row. Serializers the
+# plan can't express (nested or method fields) fall back to the usual path.
+
+FIELDS_QUERY_PARAM = 'fields'
+
+# Fields whose representation differs from the database value
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField, serializers.TimeField,
+                    serializers.DecimalField, serializers.UUIDField)
+
+def requested_fields(request, available):
+    # The `?fields=` names, in `available` order, or None if not given
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(FIELDS_QUERY_PARAM)
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names.difference(available)
+    if unknown:
+        raise ValidationError({FIELDS_QUERY_PARAM: 'Unknown fields: %s.' % ', '.join(sorted(unknown))})
+    return [name for name in available if name in names]
+
+class SparseFieldsMixin:
+    # Drop the fields `?fields=` leaves out of a top level serializer's output
+
+    def get_fields(self):
+        fields = super().get_fields()
+        top_level = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+        if not top_level:
+            return fields
+        names = requested_fields(self.context.get('request'), list(fields))
+        if names is None:
+            return fields
+        return type(fields)((name, fields[name]) for name in names)
+
+def _column(field):
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.source + '_id'
+    if isinstance(field, serializers.SlugRelatedField):
+        return '%s__%s' % (field.source, field.slug_field)
+    if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer,
+                          serializers.SerializerMethodField)):
+        return None
+    if field.source == '*' or '.' in field.source:
+        return None
+    return field.source
+
+_plans = {}
+
+def values_plan(serializer_class):
+    # [(name, column, field to convert with or None)] for serializer_class's output, None if it needs instances
+    if serializer_class not in _plans:
+        plan = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            column = _column(field)
+            if column is None:
+                plan = None
+                break
+            plan.append((name, column, field if isinstance(field, CONVERTED_FIELDS) else None))
+        _plans[serializer_class] = plan
+    return _plans[serializer_class]
+
+def _converter(field):
+    if field is None:
+        return None
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if not isinstance(field, serializers.DateTimeField) or output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    # DateTimeField.to_representation, with the current timezone looked up once rather than per value
+    timezone = getattr(field, 'timezone', field.default_timezone())
+
+    def convert(value):
+        if timezone is None or isinstance(value, str) or not is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+def serialize_rows(plan, rows):
+    # What serializer_class(instances, many=True).data gives for the same rows
+    plan = [(name, column, _converter(field)) for name, column, field in plan]
+    data = []
+    for row in rows:
+        item = {}
+        for name, column, convert in plan:
+            value = row[column]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
+
+class ValuesListMixin:
+    # Serve list() from .values() rows, see above
+
+    def list(self, request, *args, **kwargs):
+        plan = values_plan(self.get_serializer_class())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        names = requested_fields(request, [name for name, column, field in plan])
+        if names is not None:
+            plan = [entry for entry in plan if entry[0] in names]
+
+        # Keyset pagination reads its cursor keys from the rows
+        columns = [column for name, column, field in plan]
+        cursor_fields = ('id',) + tuple(getattr(self, 'cursor_ordering_fields', ()))
+        columns += [field for field in cursor_fields if field not in columns]
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        with timed('serialize'):
+            data = serialize_rows(plan, queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
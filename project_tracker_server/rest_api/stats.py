@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from rest_api.models import ProjectSummary, Task
+from rest_api.summary import actual_counts
+
+# Task breakdowns for project dashboards
+#
+# Read from the incrementally maintained ProjectSummary rows, one query per
+# call, and keyed by the choice labels. Every label is present, so clients
+# don't have to fill in zeros.
+
+BREAKDOWNS = (
+    ('status', Task.STATUSES),
+    ('priority', Task.PRIORITY_LEVELS),
+    ('category', Task.CATEGORIES),
+)
+
+def _empty():
+    stats = OrderedDict(total=0)
+    for field, choices in BREAKDOWNS:
+        stats[field] = OrderedDict((label, 0) for value, label in choices)
+    return stats
+
+def _from_counts(counts, last_activity=None):
+    stats = _empty()
+    stats['total'] = counts['total']
+    for field, choices in BREAKDOWNS:
+        for value, label in choices:
+            stats[field][label] = counts[ProjectSummary.COUNTERS[(field, value)]]
+    stats['last_activity'] = last_activity
+    return stats
+
+def task_stats(project_ids):
+    # {project_id: stats} for every requested project, including empty ones
+    project_ids = sorted(project_ids)
+    summaries = ProjectSummary.objects.in_bulk(project_ids)
+
+    # Projects without a summary row yet are counted from the task table
+    missing = [project_id for project_id in project_ids if project_id not in summaries]
+    counted = actual_counts(missing) if missing else {}
+
+    stats = OrderedDict()
+    for project_id in project_ids:
+        summary = summaries.get(project_id)
+        if summary is not None:
+            stats[project_id] = _from_counts(summary.__dict__, summary.last_activity)
+        else:
+            stats[project_id] = _from_counts(counted[project_id])
+    return stats
+
+def combined_stats(project_stats):
+    # Totals across several projects' stats, last_activity is the most recent
+    combined = _empty()
+    combined['last_activity'] = None
+    for stats in project_stats:
+        combined['total'] += stats['total']
+        for field, choices in BREAKDOWNS:
+            for label, count in stats[field].items():
+                combined[field][label] += count
+        if stats['last_activity'] is not None and (combined['last_activity'] is None or stats['last_activity'] > combined['last_activity']):
+            combined['last_activity'] = stats['last_activity']
+    return combined
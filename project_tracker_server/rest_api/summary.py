@@ -0,0 +1,133 @@
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from rest_api.models import Project, ProjectSummary, Task
+
+# Incrementally maintained task counts, see ProjectSummary
+#
+# Task saves and deletes apply +1/-1 deltas to the counters of the task's old
+# and new state in the same transaction (rest_api/signals.py), and bulk writes
+# apply theirs in one UPDATE per project (rest_api/bulk.py). rebuild_summaries
+# recounts from the task table to repair drift, check_summaries reports it.
+
+COUNTED_FIELDS = ('status', 'priority', 'category')
+COUNTER_COLUMNS = ('total',) + tuple(ProjectSummary.COUNTERS.values())
+REBUILD_BATCH_SIZE = 500
+
+# Projects being deleted, whose summary rows are going away with their tasks
+_deleting_projects = contextvars.ContextVar('deleting_projects', default=frozenset())
+
+def task_state(task):
+    # (project_id, status, priority, category) as loaded or saved, deferred fields are None
+    return tuple(task.__dict__.get(field) for field in ('project_id',) + COUNTED_FIELDS)
+
+def _columns(state):
+    values = dict(zip(COUNTED_FIELDS, state[1:]))
+    return ['total'] + [ProjectSummary.COUNTERS[key] for key in values.items() if key in ProjectSummary.COUNTERS]
+
+def add_change(deltas, before, after):
+    # Fold one task's transition into {project_id: Counter(column: delta)}, None is "doesn't exist"
+    if before is not None:
+        deltas[before[0]].subtract(_columns(before))
+    if after is not None:
+        deltas[after[0]].update(_columns(after))
+    return deltas
+
+def changes():
+    return defaultdict(Counter)
+
+def apply_changes(deltas):
+    now = timezone.now()
+    deleting = _deleting_projects.get()
+    missing = []
+    for project_id, counts in deltas.items():
+        if project_id in deleting:
+            continue
+        updates = {column: F(column) + delta for column, delta in counts.items() if delta}
+        updated = ProjectSummary.objects.filter(project_id=project_id).update(last_activity=now, **updates)
+        if not updated:
+            missing.append(project_id)
+    if missing:
+        # No summary row yet, count from scratch once committed. A cascade from outside
+        # deleting_projects (an owner's account being deleted) has removed it by then,
+        # recounting mid-cascade would recreate the row the project delete then trips over
+        transaction.on_commit(lambda: rebuild_summaries(missing))
+
+def record_change(before, after):
+    apply_changes(add_change(changes(), before, after))
+
+@contextmanager
+def deleting_projects(project_ids):
+    # Per-task updates are pointless while projects are deleted along with their tasks and summaries
+    token = _deleting_projects.set(_deleting_projects.get() | frozenset(project_ids))
+    try:
+        yield
+    finally:
+        _deleting_projects.reset(token)
+
+def is_project_deleting(project_id):
+    return project_id in _deleting_projects.get()
+
+def actual_counts(project_ids):
+    # {project_id: {column: count}} straight from the task table, one GROUP BY
+    counts = {project_id: dict.fromkeys(COUNTER_COLUMNS, 0) for project_id in project_ids}
+    rows = (Task.objects.filter(project_id__in=project_ids).order_by()
+            .values('project_id', *COUNTED_FIELDS).annotate(count=Count('id')))
+    for row in rows:
+        project_counts = counts[row['project_id']]
+        project_counts['total'] += row['count']
+        for field in COUNTED_FIELDS:
+            column = ProjectSummary.COUNTERS.get((field, row[field]))
+            if column is not None:
+                project_counts[column] += row['count']
+    return counts
+
+def _project_batches(project_ids):
+    if project_ids is None:
+        project_ids = Project.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=REBUILD_BATCH_SIZE)
+    batch = []
+    for project_id in project_ids:
+        batch.append(project_id)
+        if len(batch) == REBUILD_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def check_summaries(project_ids=None):
+    # [(project_id, column, stored, actual)] for every counter that has drifted, empty when consistent
+    drift = []
+    for batch in _project_batches(project_ids):
+        stored = {summary.project_id: summary for summary in ProjectSummary.objects.filter(project_id__in=batch)}
+        for project_id, counts in actual_counts(batch).items():
+            summary = stored.get(project_id)
+            for column, actual in counts.items():
+                value = getattr(summary, column) if summary is not None else None
+                if value != actual:
+                    drift.append((project_id, column, value, actual))
+    return drift
+
+def rebuild_summaries(project_ids=None):
+    # Recount and store the summaries of `project_ids` (every project by default), returns how many were repaired
+    repaired = 0
+    deleting = _deleting_projects.get()
+    for batch in _project_batches(project_ids):
+        batch = [project_id for project_id in batch if project_id not in deleting]
+        with transaction.atomic():
+            # Locked before counting, so concurrent task writes apply their deltas after the recount
+            stored = {summary.project_id: summary for summary in ProjectSummary.objects.select_for_update().filter(project_id__in=batch)}
+            existing_projects = set(Project.objects.filter(id__in=batch).values_list('id', flat=True))
+            for project_id, counts in actual_counts(batch).items():
+                summary = stored.get(project_id)
+                if summary is None:
+                    if project_id in existing_projects:
+                        ProjectSummary.objects.update_or_create(project_id=project_id, defaults=counts)
+                        repaired += 1
+                elif any(getattr(summary, column) != count for column, count in counts.items()):
+                    ProjectSummary.objects.filter(project_id=project_id).update(**counts)
+                    repaired += 1
+    return repaired
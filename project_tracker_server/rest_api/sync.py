@@ -0,0 +1,131 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_api.acl import get_permission_context, with_user_membership
+from rest_api.models import Project, ProjectMembership, Task, Tombstone
+from rest_api.serializers import ProjectMembershipSerializer, ProjectSerializer, TaskSerializer
+
+# Delta sync
+#
+# A sync token is the server time the previous sync started. Changed rows are
+# found through updated_at, deleted ones through tombstones, and projects the
+# user joined since are sent in full. The window reaches SYNC_OVERLAP_SECONDS
+# further back than the token, so rows from transactions still in flight when
+# the token was issued aren't missed; clients apply everything as upserts, so
+# seeing a row twice is harmless. Tokens older than the tombstone retention
+# can't be answered and need a full sync.
+#
+# A full sync is sent in pages of SYNC_PAGE_SIZE rows, projects first, then
+# memberships, then tasks, each in id order. Until the last page, `next`
+# carries the position reached along with the time the full sync started, so
+# the delta sync that follows it picks up whatever changed in between.
+
+SYNC_OVERLAP = timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', 5))
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30))
+SYNC_PAGE_SIZE = getattr(settings, 'SYNC_PAGE_SIZE', 1000)
+FULL_SYNC_ORDER = ('projects', 'memberships', 'tasks')
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sync token expired, sync again without one.'
+    default_code = 'sync_token_expired'
+
+def encode_token(moment, position=None):
+    payload = {'t': int(moment.timestamp() * 1000000)}
+    if position is not None:
+        payload['p'] = list(position)
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+def decode_token(token):
+    # (datetime the token was issued at, full sync position), both None to start a full sync
+    if not token:
+        return None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+        since = datetime.fromtimestamp(payload['t'] / 1000000, tz=dt_timezone.utc)
+        position = payload.get('p')
+        if position is not None:
+            kind, after = position
+            if not (isinstance(kind, int) and isinstance(after, int) and 0 <= kind < len(FULL_SYNC_ORDER)):
+                raise ValueError(position)
+            position = (kind, after)
+    except (TypeError, ValueError, KeyError, AttributeError, UnicodeError, OverflowError, OSError):
+        raise ValidationError({'since': ['Invalid sync token.']})
+    if since < timezone.now() - TOMBSTONE_RETENTION:
+        raise SyncTokenExpired()
+    return since, position
+
+def full_sync_page(querysets, position, page_size):
+    # Up to page_size rows from where the previous page stopped, and where this one did (None at the end)
+    kind, after = position or (0, 0)
+    rows = {name: [] for name in FULL_SYNC_ORDER}
+    budget = page_size
+    while kind < len(FULL_SYNC_ORDER):
+        name = FULL_SYNC_ORDER[kind]
+        page = list(querysets[name].filter(id__gt=after).order_by('id')[:budget + 1])
+        if len(page) > budget:
+            rows[name] = page[:budget]
+            return rows, (kind, rows[name][-1].id if rows[name] else after)
+        rows[name] = page
+        budget -= len(page)
+        kind, after = kind + 1, 0
+    return rows, None
+
+def sync(request, since, position=None):
+    started = timezone.now()
+    if position is not None:
+        # Continuing a full sync, its token keeps the time it started
+        started, since = since, None
+    user = request.user
+    permission_context = get_permission_context(request)
+    visible = permission_context.project_scope()
+
+    projects = with_user_membership(Project.objects.filter(id__in=visible).select_related('owner'), user)
+    memberships = ProjectMembership.objects.filter(project_id__in=visible).select_related('owner')
+    tasks = Task.objects.filter(project_id__in=visible).select_related('owner')
+    deleted = {'projects': [], 'memberships': [], 'tasks': []}
+
+    if since is not None:
+        window = since - SYNC_OVERLAP
+        # Projects the user joined since are new to the client, tasks and all
+        joined = list(ProjectMembership.objects.filter(owner=user, project_id__in=visible, created_at__gte=window).values_list('project_id', flat=True))
+
+        projects = projects.filter(Q(updated_at__gte=window) | Q(user_membership__updated_at__gte=window) | Q(id__in=joined))
+        memberships = memberships.filter(Q(updated_at__gte=window) | Q(project_id__in=joined))
+        tasks = tasks.filter(Q(updated_at__gte=window) | Q(project_id__in=joined))
+
+        tombstones = Tombstone.objects.filter(deleted_at__gte=window).filter(
+            Q(project_id__in=visible) | Q(kind=Tombstone.MEMBERSHIP, user_id=user.id)
+        ).values_list('kind', 'object_id', 'project_id', 'user_id')
+        member_of = set(permission_context.project_ids())
+        for kind, object_id, project_id, user_id in tombstones:
+            if kind == Tombstone.TASK:
+                deleted['tasks'].append(object_id)
+            else:
+                deleted['memberships'].append(object_id)
+                if user_id == user.id and project_id not in member_of:
+                    # The project was deleted or the user removed from it
+                    deleted['projects'].append(project_id)
+    else:
+        rows, position = full_sync_page({'projects': projects, 'memberships': memberships, 'tasks': tasks}, position, SYNC_PAGE_SIZE)
+        projects, memberships, tasks = rows['projects'], rows['memberships'], rows['tasks']
+
+    context = {'request': request}
+    task_data = TaskSerializer(tasks, many=True, context=context).data
+    # A task moved between two visible projects has a tombstone in the old one
+    returned = {task['id'] for task in task_data}
+    deleted['tasks'] = [task_id for task_id in deleted['tasks'] if task_id not in returned]
+    return {
+        'projects': ProjectSerializer(projects, many=True, context=context).data,
+        'memberships': ProjectMembershipSerializer(memberships, many=True, context=context).data,
+        'tasks': task_data,
+        'deleted': deleted,
+        'has_more': position is not None,
+        'next': encode_token(started, position),
+    }
@@ -1,7 +1,40 @@
 from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
 from django.contrib.auth.models import User
-from rest_api.models import Project, ProjectMembership, Task
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_delete
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_api.db import check_connections
+from rest_api.models import Project, ProjectMembership, ProjectSummary, PurgeJob, Task, Tombstone
+from rest_api.serializers import TaskSerializer
+from rest_api.replicas import ReplicaRouter, replica_reads
+from rest_api.purge import claim_job, queue_purge
+from rest_api.push import RESYNC, InMemoryBroker, get_broker
+from rest_api.summary import check_summaries, is_project_deleting
+from rest_api.throttling import CacheThrottleStore, SQLiteThrottleStore, UserRateThrottle
+from rest_api.sync import encode_token as sync_token
+from rest_api import cache as acl_cache
+from project_tracker_server.asgi import application as asgi_application
+from project_tracker_server.platform_config import load_environment
+
+from datetime import timedelta
+
+import asyncio
+import base64
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+from unittest import mock
 
 class UserTests(APITestCase):
     def test_create_user(self):
@@ -124,6 +157,38 @@ class ProjectTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 4)
 
+    def test_get_project_list_query_count(self):
+        """
+        Ensure the project list costs the same number of queries regardless of project count
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        url = '/projects/'
+        query_counts = []
+
+        for num_projects in (2, 10):
+            for i in range(num_projects):
+                # Create Projects and Memberships
+                project = Project.objects.create(name="Project" + str(i), description="Test Project", owner=self.user)
+                ProjectMembership.objects.create(owner=self.user, project=project, permission_level=(i % 3) + 1)
+
+            # Request
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+
+            # Tests
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(context.captured_queries))
+
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(response.data['results'][0]['permission_level'], 1)
+        self.assertEqual(response.data['results'][1]['permission_level'], 2)
+        self.assertEqual(query_counts[0], query_counts[1])
+
     def test_get_project(self):
         """
         Ensure we get projects correctly
@@ -604,6 +669,100 @@ class TaskTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 3)
 
+    def test_get_task_list_cursor(self):
+        """
+        Ensure we can walk tasks with cursor pagination in both directions
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        for i in range(45):
+            Task.objects.create(project=project, owner=self.user, name="Test Task Name " + str(i), status=(i % 4) + 1)
+
+        # Request
+        url = '/tasks/?cursor=&ordering=status'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 45)
+            seen.extend((task['status'], task['id']) for task in response.data['results'])
+            last_page = response.data['results']
+            url = response.data['next']
+
+        # Tests
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 45)
+
+        response = self.client.get(response.data['previous'] + '&count=false')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual([(task['status'], task['id']) for task in response.data['results']], seen[20:40])
+        self.assertNotEqual(response.data['results'], last_page)
+
+    def test_get_task_list_tampered_cursor(self):
+        """
+        Ensure cursors with values of the wrong type are rejected rather than failing the request
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+
+        for position in (["x", 1], [1, None], [[1], 2], "ab"):
+            # Request
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode('ascii')).decode('ascii')
+            response = self.client.get('/tasks/?ordering=status&cursor=' + cursor)
+
+            # Tests
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+        response = self.client.get('/projects/?cursor=' + base64.urlsafe_b64encode(b'{"p":["1; --"],"r":0}').decode('ascii'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_task_list_without_count(self):
+        """
+        Ensure page number pagination can skip the total count
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        for i in range(25):
+            Task.objects.create(project=project, owner=self.user, name="Test Task Name " + str(i))
+
+        # Request
+        url = '/tasks/?count=false'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNone(response.data['previous'])
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
     def test_get_task(self):
         """
         Ensure we can get a task correctly
@@ -760,6 +919,34 @@ class TaskTests(APITestCase):
             self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
             self.assertEqual(response.data['detail'], "You do not have permission to perform this action.")
 
+    def test_patch_task_permission_queries(self):
+        """
+        Ensure a task patch loads the user's memberships only once
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        test_user = User.objects.create(username='TestUser1', password='test1542')
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=test_user)
+        ProjectMembership.objects.create(owner=test_user, project=project, permission_level=1)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=2)
+        Task.objects.create(project=project, owner=test_user, name="Test Task Name", description="Test Task Description")
+
+        # Request
+        url = '/tasks/1/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url, data={"description": "New Description"})
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        membership_queries = [query for query in context.captured_queries if 'rest_api_projectmembership' in query['sql']]
+        self.assertEqual(len(membership_queries), 1)
+
     def test_delete_task(self):
         """
         Ensure we can delete a task correctly
@@ -839,3 +1026,1895 @@ class TaskTests(APITestCase):
             # Tests
             self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
             self.assertEqual(response.data['detail'], "You do not have permission to perform this action.")
+
+class TokenCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_token_authentication(self):
+        """
+        Ensure token lookups are cached and dropped on logout and deactivation
+        """
+
+        # User Details
+        username = "TestUser"
+        password = "pass1542"
+        user_payload = {"username": username, "password": password, "email": username + "@test.com"}
+        self.client.post('/auth/users/', user_payload)
+        token = self.client.post('/auth/token/login/', user_payload).data['auth_token']
+
+        # Request
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        url = '/users/'
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in context.captured_queries if 'authtoken_token' in query['sql']])
+
+        # Deactivation
+        user = User.objects.get(username=username)
+        user.is_active = False
+        user.save()
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Logout
+        user.is_active = True
+        user.save()
+        self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+        response = client.post('/auth/token/logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_task_list_not_modified(self):
+        """
+        Ensure an unchanged task list is answered with 304 without querying tasks
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        other_project = Project.objects.create(name="Project2", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=other_project, permission_level=1)
+        task = Task.objects.create(project=project, owner=self.user, name="Test Task Name")
+
+        # Request
+        url = '/tasks/?project=1'
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse([query for query in context.captured_queries if 'rest_api_task' in query['sql']])
+
+        # Changes elsewhere don't invalidate this project's board
+        Task.objects.create(project=other_project, owner=self.user, name="Other Task")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Changes to the project do
+        task.status = Task.COMPLETED
+        task.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_project_list_not_modified(self):
+        """
+        Ensure the project list ETag follows membership and project changes
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects
+        url = '/projects/'
+        self.client.post(url, {"name": 'Tester Project', "description": 'Tester Project'})
+
+        # Request
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Project edit
+        self.client.patch('/projects/1/', data={"description": "New Description"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Membership move
+        self.client.patch('/projectmemberships/1/', data={"location": ProjectMembership.ARCHIVE})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_owner_rename_modifies_lists(self):
+        """
+        Ensure lists showing a renamed user as an owner get a new ETag
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+        other_user = User.objects.create(username='TestUser1', password='test1542')
+
+        # Setup Projects and Tasks, other_user owns a task in the user's project
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        ProjectMembership.objects.create(owner=other_user, project=project, permission_level=2)
+        Task.objects.create(project=project, owner=other_user, name="Test Task Name")
+        task_etag = self.client.get('/tasks/')['ETag']
+        project_etag = self.client.get('/projects/')['ETag']
+
+        # Other changes to the user leave them alone
+        other_user.email = 'test@example.com'
+        other_user.save()
+        self.assertEqual(self.client.get('/tasks/', HTTP_IF_NONE_MATCH=task_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Renames
+        other_user.username = 'Renamed'
+        other_user.save()
+        response = self.client.get('/tasks/', HTTP_IF_NONE_MATCH=task_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['owner'], 'Renamed')
+        self.user.username = 'Renamed Tester'
+        self.user.save()
+        response = self.client.get('/projects/', HTTP_IF_NONE_MATCH=project_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['owner'], 'Renamed Tester')
+
+class BulkTests(APITestCase):
+
+    def test_bulk_tasks(self):
+        """
+        Ensure we can create, update and delete tasks in one request
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        Task.objects.create(project=project, owner=self.user, name="Update Me")
+        Task.objects.create(project=project, owner=self.user, name="Delete Me")
+
+        # Request
+        url = '/tasks/bulk/'
+        operations = [
+            {"op": "create", "data": {"project": 1, "name": "New Task 1"}},
+            {"op": "create", "data": {"project": 1, "name": "New Task 2", "status": 2}},
+            {"op": "update", "id": 1, "data": {"status": 4}},
+            {"op": "delete", "id": 2},
+        ]
+        response = self.client.post(url, operations)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 200, 204])
+        self.assertEqual(response.data['results'][1]['data']['status'], 2)
+        self.assertEqual(Task.objects.count(), 3)
+        self.assertEqual(Task.objects.get(id=1).status, 4)
+        self.assertFalse(Task.objects.filter(id=2).exists())
+
+    def test_bulk_tasks_all_or_nothing(self):
+        """
+        Ensure a bulk request with a forbidden item applies nothing
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        test_user = User.objects.create(username='TestUser1', password='test1542')
+
+        # Setup Projects
+        project = Project.objects.create(name="Project1", description="Test Project", owner=test_user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=2)
+        project = Project.objects.create(name="Project2", description="Test Project", owner=test_user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=3)
+
+        # Request
+        url = '/tasks/bulk/'
+        operations = [
+            {"op": "create", "data": {"project": 1, "name": "Allowed"}},
+            {"op": "create", "data": {"project": 2, "name": "View only"}},
+            {"op": "update", "id": 99, "data": {"status": 4}},
+        ]
+        response = self.client.post(url, operations)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], [424, 403, 404])
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_bulk_tasks_duplicate_ids(self):
+        """
+        Ensure a bulk request with two operations on one task applies nothing
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        task = Task.objects.create(project=project, owner=self.user, name="Task", status=Task.BACKLOG)
+
+        # Request
+        url = '/tasks/bulk/'
+        operations = [
+            {"op": "update", "id": task.id, "data": {"status": Task.TESTING}},
+            {"op": "delete", "id": task.id},
+            {"op": "update", "id": task.id, "data": {"name": "Renamed"}},
+        ]
+        response = self.client.post(url, operations)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], [424, 400, 400])
+        self.assertEqual(response.data['results'][1]['errors'], {'id': ['Duplicate operation for this task.']})
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.name), (Task.BACKLOG, "Task"))
+
+    def test_bulk_membership_locations(self):
+        """
+        Ensure we can move many memberships between locations in one request
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Memberships
+        for i in range(3):
+            project = Project.objects.create(name="Project" + str(i), description="Test Project", owner=self.user)
+            ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+
+        # Request
+        url = '/projectmemberships/bulk/'
+        operations = [{"id": 1, "location": ProjectMembership.ARCHIVE}, {"id": 2, "location": ProjectMembership.TRASH}]
+        response = self.client.post(url, operations)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][1]['data']['location'], ProjectMembership.TRASH)
+        response = self.client.get('/projects/?location=' + str(ProjectMembership.MAIN))
+        self.assertEqual(response.data['count'], 1)
+
+        # Request
+        response = self.client.post(url, [{"id": 3, "location": 7}])
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('location', response.data['results'][0]['errors'])
+
+class ACLCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        acl_cache.reset_stats()
+
+    def test_acl_cached_across_requests(self):
+        """
+        Ensure a user's memberships are loaded once and then served from the cache
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        Task.objects.create(project=project, owner=self.user, name="Test Task Name")
+
+        # Request
+        url = '/tasks/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(acl_cache.get_stats()['misses'], 1)
+        self.assertEqual(acl_cache.get_stats()['hits'], 1)
+        self.assertFalse([query for query in context.captured_queries if 'rest_api_projectmembership' in query['sql']])
+
+    def test_many_memberships_scoped_by_subquery(self):
+        """
+        Ensure lists past the scope limit select the user's projects in a subquery, with the same results
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+        other_user = User.objects.create(username='TestUser1', password='test1542')
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        Task.objects.create(project=project, owner=self.user, name="Visible")
+        other_project = Project.objects.create(name="Project2", description="Not shared", owner=other_user)
+        ProjectMembership.objects.create(owner=other_user, project=other_project, permission_level=1)
+        Task.objects.create(project=other_project, owner=other_user, name="Hidden")
+
+        # Request
+        with mock.patch('rest_api.acl.PROJECT_SCOPE_LIST_LIMIT', 0):
+            with CaptureQueriesContext(connection) as context:
+                tasks = self.client.get('/tasks/')
+            # The next request resets the query log
+            task_queries = [query['sql'] for query in context.captured_queries if 'FROM "rest_api_task"' in query['sql']]
+            synced = self.client.get('/sync/')
+
+        # Tests
+        self.assertEqual([task['name'] for task in tasks.data['results']], ['Visible'])
+        self.assertTrue(task_queries)
+        self.assertTrue(all('rest_api_projectmembership' in sql for sql in task_queries))
+        self.assertEqual([item['id'] for item in synced.data['projects']], [project.id])
+        self.assertEqual([item['name'] for item in synced.data['tasks']], ['Visible'])
+
+    def test_acl_invalidated_on_membership_change(self):
+        """
+        Ensure membership and project writes invalidate the cached ACL
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        test_user = User.objects.create(username='TestUser1', password='test1542')
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=test_user)
+        Task.objects.create(project=project, owner=test_user, name="Test Task Name")
+
+        # Request
+        url = '/tasks/1/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Membership grant
+        membership = ProjectMembership.objects.create(owner=self.user, project=project, permission_level=3)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Membership revoke
+        membership.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Ownership transfer
+        project.owner = self.user
+        project.save()
+        response = self.client.patch(url, data={"description": "New Description"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(acl_cache.get_stats()['misses'], 4)
+
+    def test_unshared_cache(self):
+        """
+        Ensure nothing is cached across requests when the cache isn't shared between workers
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+
+        with mock.patch('rest_api.cache.CACHE_SHARED', False):
+            # Request
+            self.client.get('/tasks/')
+            response = self.client.get('/tasks/')
+
+            # Tests
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('ETag', response)
+            self.assertEqual(acl_cache.get_stats()['hits'], 0)
+            self.assertEqual([warning.id for warning in acl_cache.check_cache_shared(None)], ['rest_api.W001'])
+        self.assertEqual(acl_cache.check_cache_shared(None), [])
+
+class RequestMetricsTests(APITestCase):
+
+    def test_server_timing_header(self):
+        """
+        Ensure responses report query count and phase timings
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        Task.objects.create(project=project, owner=self.user, name="Test Task Name")
+
+        # Request
+        url = '/tasks/'
+        with self.assertLogs('rest_api.requests', level='DEBUG') as logs, CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        server_timing = response['Server-Timing']
+        self.assertIn('db;dur=', server_timing)
+        self.assertIn('"%d queries"' % len(context.captured_queries), server_timing)
+        for phase in ('view', 'serialize', 'render', 'total'):
+            self.assertIn(phase + ';dur=', server_timing)
+        self.assertIn('view=TaskViewSet.list', logs.output[0])
+
+class AsyncReadTests(APITransactionTestCase):
+
+    async def asgi_get(self, path, token):
+        # One GET through project_tracker_server.asgi, as an ASGI server would send it
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', ('Token ' + token).encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        communicator = ApplicationCommunicator(asgi_application, scope)
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(10)
+            body += message.get('body', b'')
+            if not message.get('more_body', False):
+                break
+        await communicator.wait()
+        return start['status'], dict(start['headers']), body
+
+    def test_concurrent_async_reads(self):
+        """
+        Ensure task and project reads are served by the async views under ASGI
+        """
+
+        # Setup User and Token
+        self.user = User.objects.create(username='Tester', password='test1542')
+        token = Token.objects.create(user=self.user).key
+
+        # Setup Projects and Tasks
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        task = Task.objects.create(project=project, owner=self.user, name="Test Task Name")
+
+        # Requests
+        paths = ['/tasks/', '/tasks/%d/' % task.id, '/projects/', '/projects/%d/' % project.id, '/users/']
+
+        async def get_all():
+            return await asyncio.gather(*[self.asgi_get(path, token) for path in paths])
+
+        with self.assertLogs('rest_api.requests', level='DEBUG') as logs:
+            responses = async_to_sync(get_all)()
+
+        # Tests
+        for status_code, headers, body in responses:
+            self.assertEqual(status_code, status.HTTP_200_OK)
+            self.assertIn(b'Server-Timing', headers)
+        responses = [(status_code, headers, json.loads(body)) for status_code, headers, body in responses]
+        self.assertEqual(responses[0][2]['results'][0]['name'], "Test Task Name")
+        self.assertEqual(responses[1][2]['id'], task.id)
+        self.assertEqual(responses[2][2]['results'][0]['id'], project.id)
+        self.assertEqual(responses[3][2]['name'], "Project1")
+        self.assertEqual(responses[4][2]['count'], 1)
+        for view in ('TaskViewSet.list', 'TaskViewSet.retrieve', 'ProjectViewSet.list', 'ProjectViewSet.retrieve'):
+            self.assertTrue(any('view=%s ' % view in line for line in logs.output))
+
+    def test_streaming_export(self):
+        """
+        Ensure streamed task exports are iterated off the event loop under ASGI
+        """
+
+        # Setup User, Token, Project and Tasks
+        self.user = User.objects.create(username='Tester', password='test1542')
+        token = Token.objects.create(user=self.user).key
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=1)
+        for i in range(3):
+            Task.objects.create(project=project, owner=self.user, name="Task" + str(i))
+
+        # Request
+        status_code, headers, body = async_to_sync(self.asgi_get)('/projects/%d/tasks/export/' % project.id, token)
+
+        # Tests
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual([json.loads(line)['name'] for line in body.decode().splitlines()], ["Task0", "Task1", "Task2"])
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        self.other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.other_user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.VIEW)
+        for i in range(45):
+            Task.objects.create(project=self.project, owner=self.other_user, name="Task" + str(i), priority=i % 4 + 1)
+        self.hidden_project = Project.objects.create(name="Project2", description="Should not be returned", owner=self.other_user)
+        Task.objects.create(project=self.hidden_project, owner=self.other_user, name="Hidden Task")
+
+    def test_export_ndjson(self):
+        """
+        Ensure every task of a project is streamed as NDJSON in one response
+        """
+
+        # Request
+        url = '/projects/%d/tasks/export/' % self.project.id
+        response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 45)
+        task = TaskSerializer(Task.objects.filter(project=self.project).first()).data
+        self.assertEqual(rows[0], dict(task))
+
+    def test_export_without_server_side_cursors(self):
+        """
+        Ensure exports page through the tasks when server-side cursors are disabled
+        """
+
+        # Request
+        url = '/projects/%d/tasks/export/' % self.project.id
+        with mock.patch.dict(connection.settings_dict, DISABLE_SERVER_SIDE_CURSORS=True), mock.patch('rest_api.export.CHUNK_SIZE', 10):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+                rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in rows], ["Task" + str(i) for i in range(45)])
+        self.assertEqual(len([query for query in context.captured_queries if 'rest_api_task' in query['sql']]), 5)
+
+    def test_export_csv(self):
+        """
+        Ensure tasks can be exported as CSV
+        """
+
+        # Request
+        url = '/projects/%d/tasks/export/?format=csv' % self.project.id
+        response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('project-%d-tasks.csv' % self.project.id, response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,project,owner,name,description,category,priority,status,created_at,updated_at')
+        self.assertEqual(len(lines), 46)
+
+    def test_export_permissions(self):
+        """
+        Ensure tasks of projects the user can't view aren't exported
+        """
+
+        # Tests
+        response = self.client.get('/projects/%d/tasks/export/' % self.hidden_project.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/projects/9999/tasks/export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class StatsTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.project1 = Project.objects.create(name="Project1", description="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Project2", description="Test Project 2", owner=other_user)
+        self.hidden_project = Project.objects.create(name="Project3", description="Should not be returned", owner=other_user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project1, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.create(owner=self.user, project=self.project2, permission_level=ProjectMembership.VIEW, location=ProjectMembership.ARCHIVE)
+
+        Task.objects.create(project=self.project1, owner=self.user, status=Task.BACKLOG, priority=Task.HIGH, category=Task.BUGFIX)
+        Task.objects.create(project=self.project1, owner=self.user, status=Task.BACKLOG, priority=Task.LOW, category=Task.TASK)
+        Task.objects.create(project=self.project1, owner=self.user, status=Task.COMPLETED, priority=Task.HIGH, category=Task.TASK)
+        Task.objects.create(project=self.project2, owner=other_user, status=Task.TESTING, priority=Task.MEDIUM, category=Task.FEATURE)
+        Task.objects.create(project=self.hidden_project, owner=other_user, status=Task.TESTING)
+
+    def test_project_stats(self):
+        """
+        Ensure a project's task counts are broken down by label
+        """
+
+        # Request
+        url = '/projects/%d/stats/' % self.project1.id
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['project'], self.project1.id)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['status'], {"Backlog": 2, "In Progess": 0, "Testing": 0, "Completed": 1})
+        self.assertEqual(response.data['priority'], {"None": 0, "Low": 1, "Medium": 0, "High": 2})
+        self.assertEqual(response.data['category'], {"Task": 2, "Feature": 0, "Bug": 1, "Other": 0})
+        self.assertIsNotNone(response.data['last_activity'])
+        # Served from ProjectSummary, without counting tasks
+        self.assertEqual(len([query for query in context.captured_queries if 'rest_api_projectsummary' in query['sql']]), 1)
+        self.assertFalse([query for query in context.captured_queries if 'GROUP BY' in query['sql']])
+
+        # Projects the user can't see
+        response = self.client.get('/projects/%d/stats/' % self.hidden_project.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_all_project_stats(self):
+        """
+        Ensure stats cover every project the user can see, optionally in one location
+        """
+
+        # Request
+        response = self.client.get('/projects/stats/')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['status']['Testing'], 1)
+        self.assertEqual([project['project'] for project in response.data['projects']], [self.project1.id, self.project2.id])
+        self.assertEqual(response.data['projects'][1]['category']['Feature'], 1)
+
+        # Filter by location
+        response = self.client.get('/projects/stats/?location=%d' % ProjectMembership.ARCHIVE)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual([project['project'] for project in response.data['projects']], [self.project2.id])
+
+class ProjectSummaryTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects
+        self.project1 = Project.objects.create(name="Project1", description="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Project2", description="Test Project 2", owner=self.user)
+        for project in (self.project1, self.project2):
+            ProjectMembership.objects.create(owner=self.user, project=project, permission_level=ProjectMembership.SHARE)
+
+    def test_incremental_updates(self):
+        """
+        Ensure summaries follow task creates, status changes, moves and deletes
+        """
+
+        # Create
+        for i in range(3):
+            response = self.client.post('/tasks/', {"project": self.project1.id, "name": "Task" + str(i), "status": Task.BACKLOG})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = response.data['id']
+        summary = ProjectSummary.objects.get(project=self.project1)
+        self.assertEqual((summary.total, summary.status_backlog), (3, 3))
+        self.assertIsNotNone(summary.last_activity)
+
+        # Status transition
+        self.client.patch('/tasks/%d/' % task_id, {"status": Task.COMPLETED})
+        summary.refresh_from_db()
+        self.assertEqual((summary.total, summary.status_backlog, summary.status_completed), (3, 2, 1))
+
+        # Project move
+        task = Task.objects.get(id=task_id)
+        task.project = self.project2
+        task.priority = Task.HIGH
+        task.save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total, summary.status_completed), (2, 0))
+        moved = ProjectSummary.objects.get(project=self.project2)
+        self.assertEqual((moved.total, moved.status_completed, moved.priority_high), (1, 1, 1))
+
+        # Delete
+        self.client.delete('/tasks/%d/' % task_id)
+        moved.refresh_from_db()
+        self.assertEqual(moved.total, 0)
+        self.assertEqual(check_summaries(), [])
+
+        # Deleting a project removes its summary along with its tasks
+        self.project1.delete()
+        self.assertFalse(ProjectSummary.objects.filter(project_id=self.project1.id).exists())
+        self.assertEqual(check_summaries(), [])
+
+    def test_failed_project_delete(self):
+        """
+        Ensure a project delete that fails part way leaves its summary maintained
+        """
+
+        # Setup Tasks and a failing cascade
+        Task.objects.create(project=self.project1, owner=self.user, name="Task")
+
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError('cascade failed')
+        post_delete.connect(fail, sender=ProjectMembership)
+
+        # Delete
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.project1.delete()
+        finally:
+            post_delete.disconnect(fail, sender=ProjectMembership)
+
+        # Tests
+        self.assertFalse(is_project_deleting(self.project1.id))
+        task = Task.objects.create(project=self.project1, owner=self.user, name="Task")
+        self.assertEqual(ProjectSummary.objects.get(project=self.project1).total, 2)
+        task_id = task.id
+        task.delete()
+        self.assertTrue(Tombstone.objects.filter(kind=Tombstone.TASK, object_id=task_id).exists())
+        self.assertEqual(check_summaries(), [])
+
+        # Deleting the owner takes their projects along
+        self.user.delete()
+        self.assertFalse(ProjectSummary.objects.exists())
+
+    def test_bulk_updates(self):
+        """
+        Ensure bulk task writes keep summaries consistent
+        """
+
+        # Setup Tasks
+        task = Task.objects.create(project=self.project1, owner=self.user, name="Task", status=Task.BACKLOG)
+
+        # Request
+        payload = [
+            {"op": "create", "data": {"project": self.project1.id, "name": "New Task", "category": Task.BUGFIX}},
+            {"op": "create", "data": {"project": self.project2.id, "name": "New Task"}},
+            {"op": "update", "id": task.id, "data": {"project": self.project2.id, "status": Task.TESTING}},
+        ]
+        response = self.client.post('/tasks/bulk/', payload, format='json')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(check_summaries(), [])
+        self.assertEqual(ProjectSummary.objects.get(project=self.project2).status_testing, 1)
+
+        response = self.client.post('/tasks/bulk/', [{"op": "delete", "id": task.id}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(check_summaries(), [])
+
+    def test_bulk_repeated_ids(self):
+        """
+        Ensure a rejected batch repeating a task leaves summaries untouched
+        """
+
+        # Setup Tasks
+        task = Task.objects.create(project=self.project1, owner=self.user, name="Task", status=Task.BACKLOG)
+        Task.objects.create(project=self.project1, owner=self.user, name="Other", status=Task.BACKLOG)
+
+        # Request
+        payload = [
+            {"op": "update", "id": task.id, "data": {"status": Task.TESTING}},
+            {"op": "update", "id": task.id, "data": {"status": Task.COMPLETED}},
+        ]
+        response = self.client.post('/tasks/bulk/', payload, format='json')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        summary = ProjectSummary.objects.get(project=self.project1)
+        self.assertEqual((summary.total, summary.status_backlog), (2, 2))
+        self.assertEqual(check_summaries(), [])
+
+    def test_rebuild(self):
+        """
+        Ensure the rebuild command repairs drifted summaries
+        """
+
+        # Setup Tasks and Drift
+        Task.objects.create(project=self.project1, owner=self.user, name="Task", priority=Task.LOW)
+        ProjectSummary.objects.filter(project=self.project1).update(total=5, priority_low=0)
+        ProjectSummary.objects.filter(project=self.project2).delete()
+        self.assertEqual(check_summaries([self.project1.id]), [(self.project1.id, 'total', 5, 1), (self.project1.id, 'priority_low', 0, 1)])
+
+        # Check only reports
+        with self.assertRaises(CommandError):
+            call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+        # Rebuild
+        out = io.StringIO()
+        call_command('rebuild_summaries', stdout=out)
+        self.assertIn('Repaired 2 project summaries', out.getvalue())
+        self.assertEqual(check_summaries(), [])
+
+class SeedTests(APITestCase):
+
+    def test_seed_saturated_memberships(self):
+        """
+        Ensure seeding finishes when nearly every user has to be a member of every project
+        """
+
+        # Seed
+        call_command('seed', users=4, projects=5, memberships=20, tasks=50, skew=3, stdout=io.StringIO())
+
+        # Tests
+        self.assertEqual(ProjectMembership.objects.count(), 20)
+        self.assertEqual(Task.objects.count(), 50)
+        self.assertEqual(check_summaries(), [])
+        with self.assertRaises(CommandError):
+            call_command('seed', users=4, projects=5, memberships=21, stdout=io.StringIO())
+
+class TaskSearchTests(APITestCase):
+
+    def test_search_tasks(self):
+        """
+        Ensure tasks can be searched by name and description within visible projects
+        """
+
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects and Tasks
+        other_user = User.objects.create(username='TestUser1', password='test1542')
+        project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        hidden_project = Project.objects.create(name="Project2", description="Should not be returned", owner=other_user)
+        ProjectMembership.objects.create(owner=self.user, project=project, permission_level=ProjectMembership.VIEW)
+        login_task = Task.objects.create(project=project, owner=self.user, name="Fix login page", description="Users can't log in on mobile")
+        Task.objects.create(project=project, owner=self.user, name="Mobile layout", description="Spacing on the settings page")
+        Task.objects.create(project=project, owner=self.user, name="Write docs", description="")
+        Task.objects.create(project=hidden_project, owner=other_user, name="Fix login page", description="Hidden")
+
+        # Request
+        response = self.client.get('/tasks/?search=mobile')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+        # Every word must match, in either field
+        response = self.client.get('/tasks/?search=login mobile')
+        self.assertEqual([task['id'] for task in response.data['results']], [login_task.id])
+
+        # Combined with the other filters
+        response = self.client.get('/tasks/?search=page&project=%d' % hidden_project.id)
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/tasks/?search=')
+        self.assertEqual(response.data['count'], 3)
+
+class SparseFieldsTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Project and Tasks
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.SHARE)
+        for number in range(3):
+            Task.objects.create(project=self.project, owner=self.user, name="Task%d" % number, description="Long description %d" % number)
+
+    def test_values_list_matches_serializer(self):
+        """
+        Ensure list responses built from values() rows match the serializers
+        """
+
+        # Request
+        response = self.client.get('/tasks/')
+        project_response = self.client.get('/projects/')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(json.dumps(response.data['results'])), TaskSerializer(Task.objects.all(), many=True).data)
+        self.assertEqual(json.loads(json.dumps(project_response.data['results'])), [self.client.get('/projects/%d/' % self.project.id).data])
+
+    def test_sparse_task_list(self):
+        """
+        Ensure ?fields= trims both the selected columns and the output
+        """
+
+        # Request
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/tasks/?fields=name,id&count=false')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'id': Task.objects.first().id, 'name': 'Task0'})
+        list_query = context.captured_queries[-1]['sql']
+        self.assertIn('"name"', list_query)
+        self.assertNotIn('"description"', list_query)
+
+        # Keyset pages still find their cursor keys
+        response = self.client.get('/tasks/?fields=name&cursor=&ordering=-status')
+        self.assertEqual([task['name'] for task in response.data['results']], ['Task2', 'Task1', 'Task0'])
+        response = self.client.get('/projects/?fields=name,permission_level')
+        self.assertEqual(response.data['results'], [{'name': 'Project1', 'permission_level': ProjectMembership.SHARE}])
+
+    def test_sparse_retrieve(self):
+        """
+        Ensure ?fields= applies to single objects and rejects unknown fields
+        """
+
+        # Request
+        task = Task.objects.first()
+        response = self.client.get('/tasks/%d/?fields=status,owner' % task.id)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'owner': 'Tester', 'status': task.status})
+        response = self.client.get('/tasks/?fields=name,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/projects/%d/?fields=secret' % self.project.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Writes always validate and return every field
+        response = self.client.patch('/tasks/%d/?fields=name' % task.id, {'status': Task.COMPLETED})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('description', response.data)
+
+class QueryCountTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+        self.rows = 0
+
+    def add_rows(self, count):
+        # Each row owned by a different user, so a lazily loaded owner would cost a query per row
+        for i in range(self.rows, self.rows + count):
+            owner = User.objects.create(username='Owner%d' % i, password='test1542')
+            project = Project.objects.create(name="Project%d" % i, description="Test Project", owner=owner)
+            ProjectMembership.objects.create(owner=owner, project=project, permission_level=ProjectMembership.SHARE)
+            ProjectMembership.objects.create(owner=self.user, project=project, permission_level=ProjectMembership.EDIT)
+            Task.objects.create(project=project, owner=owner, name="Task%d" % i)
+        self.rows += count
+
+    def test_list_query_counts(self):
+        """
+        Ensure every list endpoint costs a fixed number of queries, however many rows it returns
+        """
+
+        # Setup Expected Query Counts
+        cache.clear()
+        urls = {
+            '/users/': 2,
+            '/projects/': 2,
+            '/projectmemberships/': 2,
+            '/tasks/': 2,
+            '/projects/?fields=id,name&cursor=': 2,
+            '/tasks/?fields=id,name&cursor=&ordering=status': 2,
+            '/sync/': 3,
+        }
+
+        for count in (2, 8):
+            # Setup Rows
+            self.add_rows(count)
+            for url, expected in urls.items():
+                # Request, once to warm the ACL cache
+                self.client.get(url)
+                with self.subTest(url=url, rows=self.rows), self.assertNumQueries(expected):
+                    response = self.client.get(url)
+
+                # Tests
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_query_counts(self):
+        """
+        Ensure detail endpoints load the owner with the row
+        """
+
+        # Setup Rows
+        cache.clear()
+        self.add_rows(1)
+        urls = {
+            '/projects/%d/' % Project.objects.get().id: 'Owner0',
+            '/projectmemberships/%d/' % ProjectMembership.objects.get(owner=self.user).id: 'Tester',
+            '/tasks/%d/' % Task.objects.get().id: 'Owner0',
+        }
+
+        for url, owner in urls.items():
+            # Request, once to warm the ACL cache
+            self.client.get(url)
+            with self.subTest(url=url), self.assertNumQueries(1):
+                response = self.client.get(url)
+
+            # Tests
+            self.assertEqual(response.data['owner'], owner)
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Project
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.create(owner=self.other_user, project=self.project, permission_level=ProjectMembership.VIEW)
+
+    def routed_get(self, url):
+        # The test database has no replica alias, record where reads would go and serve them from the primary
+        routed = []
+        route = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append((model, route(router, model, **hints)))
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            response = self.client.get(url)
+        return response, {alias for model, alias in routed if model is Task}
+
+    def test_reads_use_replica(self):
+        """
+        Ensure safe requests read from a replica and writes go to the primary
+        """
+
+        # Request
+        response, aliases = self.routed_get('/tasks/')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(aliases, {'replica'})
+        self.assertEqual(ReplicaRouter().db_for_read(Task), 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Task), 'default')
+        self.assertFalse(ReplicaRouter().allow_migrate('replica', 'rest_api'))
+
+    def test_read_your_writes(self):
+        """
+        Ensure a user's reads stay on the primary for a while after they write
+        """
+
+        # Request
+        response = self.client.post('/tasks/', {'project': self.project.id, 'name': 'New Task'})
+        task_id = response.data['id']
+        response, aliases = self.routed_get('/tasks/%d/' % task_id)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(aliases, {'default'})
+
+        # Other users aren't pinned
+        self.client.force_authenticate(self.other_user)
+        response, aliases = self.routed_get('/tasks/%d/' % task_id)
+        self.assertEqual(aliases, {'replica'})
+
+        # Until the pin expires
+        cache.delete('replica_pin:%d' % self.user.id)
+        self.client.force_authenticate(self.user)
+        response, aliases = self.routed_get('/tasks/%d/' % task_id)
+        self.assertEqual(aliases, {'replica'})
+
+    def test_write_during_read(self):
+        """
+        Ensure reads after a write within the same safe request go to the primary
+        """
+
+        # Setup Request
+        request = RequestFactory().get('/tasks/')
+        request.user = self.user
+
+        # Tests
+        router = ReplicaRouter()
+        with replica_reads(request):
+            self.assertEqual(router.db_for_read(Task), 'replica')
+            router.db_for_write(Task)
+            self.assertEqual(router.db_for_read(Task), 'default')
+
+class LaggingReplicaTests(APITestCase):
+    # A second SQLite database as a replica that stopped replicating after setUp
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, the test runner only sets up the configured databases
+        cls.replica_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        connections.settings['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.replica_file.name}
+        call_command('migrate', database='replica', verbosity=0)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        os.unlink(cls.replica_file.name)
+
+    def setUp(self):
+        # Setup Client and Authentication
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Project and Tasks
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.other_user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.VIEW)
+        ProjectMembership.objects.create(owner=self.other_user, project=self.project, permission_level=ProjectMembership.SHARE)
+        Task.objects.create(project=self.project, owner=self.other_user, name="Replicated Task")
+
+        # Replicate everything so far
+        for model in (User, Project, ProjectMembership, Task):
+            model.objects.using('replica').bulk_create(model.objects.all())
+
+    def test_list_etag_skipped_on_replica(self):
+        """
+        Ensure lists read from a lagging replica don't carry the current ETag
+        """
+
+        # Another member's write the replica hasn't seen
+        Task.objects.create(project=self.project, owner=self.other_user, name="Unreplicated Task")
+
+        # Request
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            response = self.client.get('/tasks/')
+
+        # Tests
+        self.assertEqual(response.data['count'], 1)
+        self.assertNotIn('ETag', response)
+
+        # The primary's rows and ETag still answer conditional requests served from the replica
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.data['count'], 2)
+        etag = response['ETag']
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            response = self.client.get('/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_sync_reads_primary(self):
+        """
+        Ensure delta sync doesn't skip changes a lagging replica hasn't applied yet
+        """
+
+        # Another member's write the replica hasn't seen
+        since = sync_token(timezone.now())
+        task = Task.objects.create(project=self.project, owner=self.other_user, name="Unreplicated Task")
+
+        # Request
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            response = self.client.get('/sync/', {'since': since})
+
+        # Tests
+        self.assertIn(task.id, [row['id'] for row in response.data['tasks']])
+
+class UserSearchTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Users and Project
+        for username in ('alice', 'Alfred', 'ALBERT', 'bob', 'Malcolm', 'al_x'):
+            User.objects.create(username=username, password='test1542')
+        User.objects.create(username='alan', password='test1542', is_active=False)
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.create(owner=User.objects.get(username='alice'), project=self.project, permission_level=ProjectMembership.VIEW)
+
+    def search(self, query):
+        response = self.client.get('/users/search/?' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.data['results']]
+
+    def test_search_users(self):
+        """
+        Ensure users are found by case-insensitive username prefix, in order and capped
+        """
+
+        # Tests
+        self.assertEqual(self.search('q=al'), ['ALBERT', 'Alfred', 'alice', 'al_x'])
+        self.assertEqual(self.search('q=AL_'), ['al_x'])
+        self.assertEqual(self.search('q=al&limit=2'), ['ALBERT', 'Alfred'])
+        self.assertEqual(len(self.search('q=&limit=100')), 0)
+        self.assertEqual(self.search('q=lcolm'), [])
+
+    def test_search_excluding_members(self):
+        """
+        Ensure a project's members can be left out, for projects the user can see
+        """
+
+        # Tests
+        self.assertEqual(self.search('q=al&exclude_project=%d' % self.project.id), ['ALBERT', 'Alfred', 'al_x'])
+
+        other_project = Project.objects.create(name="Project2", description="Hidden", owner=User.objects.get(username='bob'))
+        response = self.client.get('/users/search/?q=al&exclude_project=%d' % other_project.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/users/search/?q=al&exclude_project=0')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ProjectPurgeTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Project, Members and Tasks
+        self.other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=self.user)
+        self.membership = ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.create(owner=self.other_user, project=self.project, permission_level=ProjectMembership.VIEW)
+        for i in range(5):
+            Task.objects.create(project=self.project, owner=self.user, name="Task" + str(i))
+
+    def purge(self):
+        output = io.StringIO()
+        call_command('purge_projects', '--once', '--batch-size=2', stdout=output)
+        return output.getvalue()
+
+    def test_large_project_purged_in_background(self):
+        """
+        Ensure large projects disappear right away and are deleted by the purge worker in batches
+        """
+
+        # Request
+        with mock.patch('rest_api.purge.PURGE_TASK_THRESHOLD', 4):
+            response = self.client.delete('/projects/%d/' % self.project.id)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get('/projects/%d/' % self.project.id).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/projects/').data['count'], 0)
+        self.assertEqual(self.client.get('/tasks/').data['count'], 0)
+        self.assertFalse(ProjectMembership.objects.filter(project=self.project).exists())
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.MEMBERSHIP, project_id=self.project.id).count(), 2)
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 5)
+
+        # Worker
+        output = self.purge()
+        self.assertIn('2/5 tasks deleted', output)
+        self.assertFalse(Project.objects.filter(id=self.project.id).exists())
+        self.assertFalse(Task.objects.filter(project_id=self.project.id).exists())
+        self.assertFalse(ProjectSummary.objects.filter(project_id=self.project.id).exists())
+        job = PurgeJob.objects.get(project_id=self.project.id)
+        self.assertEqual((job.status, job.tasks_total, job.tasks_deleted), (PurgeJob.DONE, 5, 5))
+        self.assertEqual(self.client.delete('/projects/%d/' % self.project.id).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_small_project_deleted_immediately(self):
+        """
+        Ensure projects under the threshold are still deleted within the request
+        """
+
+        # Request
+        response = self.client.delete('/projects/%d/' % self.project.id)
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Project.objects.filter(id=self.project.id).exists())
+        self.assertFalse(PurgeJob.objects.exists())
+
+    def test_expired_trash_purged(self):
+        """
+        Ensure projects their owner left in the trash past the retention window are purged
+        """
+
+        # Setup Trash
+        recent_project = Project.objects.create(name="Project2", description="Recently trashed", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=recent_project, location=ProjectMembership.TRASH)
+        ProjectMembership.objects.filter(id=self.membership.id).update(location=ProjectMembership.TRASH, trashed_at=timezone.now() - timedelta(days=31))
+        # Trashed by a member, not the owner
+        member_project = Project.objects.create(name="Project3", description="Member's trash", owner=self.other_user)
+        ProjectMembership.objects.create(owner=self.user, project=member_project, location=ProjectMembership.TRASH)
+        ProjectMembership.objects.filter(project=member_project).update(trashed_at=timezone.now() - timedelta(days=31))
+
+        # Worker
+        output = self.purge()
+
+        # Tests
+        self.assertIn('Queued 1 projects left in the trash', output)
+        self.assertEqual(set(Project.objects.values_list('id', flat=True)), {recent_project.id, member_project.id})
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.MEMBERSHIP, project_id=self.project.id).count(), 2)
+        self.assertEqual(PurgeJob.objects.get().reason, PurgeJob.TRASH_EXPIRED)
+
+    def test_trash_retention_counts_from_trashing(self):
+        """
+        Ensure the retention window starts when the project entered the trash, not at the membership's last change
+        """
+
+        # Setup Trash
+        trashed = self.client.patch('/projectmemberships/%d/' % self.membership.id, {'location': ProjectMembership.TRASH})
+        self.membership.refresh_from_db()
+        trashed_at = self.membership.trashed_at
+        ProjectMembership.objects.filter(id=self.membership.id).update(trashed_at=timezone.now() - timedelta(days=31))
+        # Later edits that keep it in the trash don't restart the clock
+        self.client.patch('/projectmemberships/%d/' % self.membership.id, {'permission_level': ProjectMembership.SHARE})
+        kept = ProjectMembership.objects.get(id=self.membership.id).trashed_at
+        # Restored, then trashed again through the bulk endpoint
+        other_project = Project.objects.create(name="Project2", description="Restored", owner=self.user)
+        other_membership = ProjectMembership.objects.create(owner=self.user, project=other_project, location=ProjectMembership.TRASH, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.filter(id=other_membership.id).update(trashed_at=timezone.now() - timedelta(days=31))
+        restored = self.client.post('/projectmemberships/bulk/', [{'id': other_membership.id, 'location': ProjectMembership.MAIN}], format='json')
+        restored_at = ProjectMembership.objects.get(id=other_membership.id).trashed_at
+        self.client.post('/projectmemberships/bulk/', [{'id': other_membership.id, 'location': ProjectMembership.TRASH}], format='json')
+
+        # Worker
+        output = self.purge()
+
+        # Tests
+        self.assertEqual(trashed.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(trashed_at)
+        self.assertLess(kept, timezone.now() - timedelta(days=30))
+        self.assertEqual(restored.status_code, status.HTTP_200_OK)
+        self.assertIsNone(restored_at)
+        self.assertIn('Queued 1 projects left in the trash', output)
+        self.assertEqual(PurgeJob.objects.get().project_id, self.project.id)
+        self.assertTrue(Project.objects.filter(id=other_project.id).exists())
+
+    def test_abandoned_job_reclaimed(self):
+        """
+        Ensure a job whose worker stopped reporting is picked up again, and running ones are left alone
+        """
+
+        # Setup Jobs
+        job = PurgeJob.objects.create(project=self.project, reason=PurgeJob.DELETED, status=PurgeJob.RUNNING)
+
+        # Tests
+        self.assertIsNone(claim_job())
+        self.assertEqual(claim_job(timezone.now() + timedelta(minutes=11)).id, job.id)
+        self.assertIsNone(claim_job(timezone.now() + timedelta(minutes=11)))
+
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        # Setup Client and Authentication
+        self.client = APIClient()
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.client.force_authenticate(self.user)
+
+        # Setup Projects, Memberships and Tasks
+        self.other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.project1 = Project.objects.create(name="Project1", description="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Project2", description="Test Project 2", owner=self.other_user)
+        self.project3 = Project.objects.create(name="Project3", description="Test Project 3", owner=self.other_user)
+        self.hidden_project = Project.objects.create(name="Project4", description="Should not be returned", owner=self.other_user)
+        ProjectMembership.objects.create(owner=self.user, project=self.project1, permission_level=ProjectMembership.SHARE)
+        ProjectMembership.objects.create(owner=self.user, project=self.project2, permission_level=ProjectMembership.VIEW)
+        ProjectMembership.objects.create(owner=self.other_user, project=self.project2, permission_level=ProjectMembership.SHARE)
+        self.tasks = [Task.objects.create(project=self.project1, owner=self.user, name="Task" + str(i)) for i in range(10)]
+        self.project2_task = Task.objects.create(project=self.project2, owner=self.other_user, name="Project2 Task")
+        Task.objects.create(project=self.project3, owner=self.other_user, name="Project3 Task")
+        Task.objects.create(project=self.hidden_project, owner=self.other_user, name="Hidden Task")
+
+    def backdate(self):
+        # Pretend everything so far happened an hour ago, and the client synced since
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Project, ProjectMembership, Task):
+            model.objects.update(created_at=an_hour_ago, updated_at=an_hour_ago)
+        return sync_token(timezone.now() - timedelta(minutes=30))
+
+    def test_full_sync(self):
+        """
+        Ensure a sync without a token returns everything the user can see
+        """
+
+        # Request
+        response = self.client.get('/sync/')
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([project['id'] for project in response.data['projects']], [self.project1.id, self.project2.id])
+        self.assertEqual(response.data['projects'][1]['permission_level'], ProjectMembership.VIEW)
+        self.assertEqual(len(response.data['memberships']), 3)
+        self.assertEqual(len(response.data['tasks']), 11)
+        self.assertEqual(response.data['deleted'], {'projects': [], 'memberships': [], 'tasks': []})
+        self.assertFalse(response.data['has_more'])
+        self.assertTrue(response.data['next'])
+
+    def test_full_sync_paged(self):
+        """
+        Ensure a full sync comes in pages, and the delta sync after the last one covers changes made while paging
+        """
+
+        # Request
+        pages = []
+        with mock.patch('rest_api.sync.SYNC_PAGE_SIZE', 4):
+            response = self.client.get('/sync/')
+            pages.append(response.data)
+            # Changed behind the cursor while paging
+            Task.objects.filter(id=self.tasks[0].id).update(status=Task.COMPLETED, updated_at=timezone.now())
+            while response.data['has_more']:
+                response = self.client.get('/sync/', {'since': response.data['next']})
+                pages.append(response.data)
+            delta = self.client.get('/sync/', {'since': response.data['next']})
+
+        # Tests
+        self.assertEqual(len(pages), 4)
+        self.assertTrue(all(len(page['projects']) + len(page['memberships']) + len(page['tasks']) <= 4 for page in pages))
+        self.assertEqual([project['id'] for page in pages for project in page['projects']], [self.project1.id, self.project2.id])
+        self.assertEqual(len([membership for page in pages for membership in page['memberships']]), 3)
+        task_ids = [task['id'] for page in pages for task in page['tasks']]
+        self.assertEqual(task_ids, sorted(set(task_ids)))
+        self.assertEqual(len(task_ids), 11)
+        self.assertEqual(delta.status_code, status.HTTP_200_OK)
+        self.assertIn(self.tasks[0].id, [task['id'] for task in delta.data['tasks']])
+        self.assertFalse(delta.data['has_more'])
+
+    def test_delta_sync(self):
+        """
+        Ensure a sync with a token returns only what changed since
+        """
+
+        # Changes since the last sync
+        since = self.backdate()
+        self.client.patch('/tasks/%d/' % self.tasks[0].id, {"status": Task.COMPLETED})
+        created = self.client.post('/tasks/', {"project": self.project1.id, "name": "New Task"}).data
+        self.client.delete('/tasks/%d/' % self.tasks[1].id)
+        # Joined project 3, removed from project 2
+        ProjectMembership.objects.create(owner=self.user, project=self.project3, permission_level=ProjectMembership.VIEW)
+        removed_id = ProjectMembership.objects.get(owner=self.user, project=self.project2).id
+        ProjectMembership.objects.filter(id=removed_id).delete()
+
+        # Request
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/sync/', {'since': since})
+
+        # Tests
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([project['id'] for project in response.data['projects']], [self.project3.id])
+        self.assertEqual(sorted(task['id'] for task in response.data['tasks']), sorted([self.tasks[0].id, created['id'], Task.objects.get(project=self.project3).id]))
+        self.assertEqual([membership['project'] for membership in response.data['memberships']], [self.project3.id])
+        self.assertEqual(response.data['deleted'], {'projects': [self.project2.id], 'memberships': [removed_id], 'tasks': [self.tasks[1].id]})
+        self.assertLessEqual(len(context.captured_queries), 10)
+
+        # Nothing changed since
+        self.backdate()
+        response = self.client.get('/sync/', {'since': response.data['next']})
+        self.assertEqual((response.data['projects'], response.data['memberships'], response.data['tasks']), ([], [], []))
+
+    def test_moved_task(self):
+        """
+        Ensure a task moved out of a project is reported as deleted to members who can't see its new project
+        """
+
+        # Setup Client
+        owner_client = APIClient()
+        owner_client.force_authenticate(self.other_user)
+        other_task = Task.objects.create(project=self.project2, owner=self.other_user, name="Bulk Moved")
+        since = self.backdate()
+
+        # Moves to a project the user can't see, one through the ORM and one in bulk
+        self.project2_task.project = self.project3
+        self.project2_task.save()
+        response = owner_client.post('/tasks/bulk/', [{"op": "update", "id": other_task.id, "data": {"project": self.project3.id}}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Moves between projects the user can see arrive as changes only
+        self.tasks[0].project = self.project2
+        self.tasks[0].save()
+
+        # Request
+        response = self.client.get('/sync/', {'since': since})
+
+        # Tests
+        self.assertEqual([task['id'] for task in response.data['tasks']], [self.tasks[0].id])
+        self.assertEqual(sorted(response.data['deleted']['tasks']), sorted([self.project2_task.id, other_task.id]))
+
+    def test_deleted_project(self):
+        """
+        Ensure members see a deleted project as removed, without a tombstone per task
+        """
+
+        # Delete
+        since = self.backdate()
+        project_id = self.project1.id
+        self.project1.delete()
+
+        # Request
+        response = self.client.get('/sync/', {'since': since})
+
+        # Tests
+        self.assertEqual(response.data['deleted']['projects'], [project_id])
+        self.assertEqual(response.data['deleted']['tasks'], [])
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.TASK).count(), 0)
+
+    def test_invalid_token(self):
+        """
+        Ensure malformed and expired tokens are rejected
+        """
+
+        # Tests
+        response = self.client.get('/sync/', {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        bad_position = base64.urlsafe_b64encode(json.dumps({'t': int(timezone.now().timestamp() * 1000000), 'p': [7, 1]}).encode('ascii')).decode('ascii')
+        response = self.client.get('/sync/', {'since': bad_position})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/sync/', {'since': sync_token(timezone.now() - timedelta(days=365))})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+class PushBrokerTests(SimpleTestCase):
+
+    def test_idle_subscribers(self):
+        """
+        Ensure thousands of idle subscribers only receive their own projects' events
+        """
+
+        broker = InMemoryBroker(queue_size=5)
+
+        async def soak():
+            subscriptions = [broker.subscribe(number, [number % 50, 50 + number % 7]) for number in range(5000)]
+            self.assertEqual(broker.subscriber_count(), 5000)
+
+            # Published from another thread, as signal handlers do
+            publisher = threading.Thread(target=lambda: [broker.publish(project_id, {'type': 'task.updated', 'project': project_id}) for project_id in (0, 1, 50)])
+            publisher.start()
+            publisher.join()
+            await asyncio.sleep(0)
+
+            received = [subscription.queue.qsize() for subscription in subscriptions]
+            for subscription in subscriptions:
+                subscription.close()
+            return received
+
+        received = async_to_sync(soak)()
+
+        # Tests
+        expected = [(number % 50 in (0, 1)) + (number % 7 == 0) for number in range(5000)]
+        self.assertEqual(received, expected)
+        self.assertEqual(broker.subscriber_count(), 0)
+        self.assertFalse(broker.has_subscribers(0))
+
+    def test_slow_subscriber(self):
+        """
+        Ensure a subscriber that falls behind is told to resync instead of buffering forever
+        """
+
+        broker = InMemoryBroker(queue_size=5)
+
+        async def flood():
+            subscription = broker.subscribe(1, [1])
+            for number in range(10):
+                broker.publish(1, {'type': 'task.updated', 'project': 1, 'data': {'id': number}})
+            await asyncio.sleep(0)
+            return [subscription.queue.get_nowait() for number in range(subscription.queue.qsize())]
+
+        self.assertEqual(async_to_sync(flood)(), [RESYNC])
+
+class PushStreamTests(APITransactionTestCase):
+
+    def setUp(self):
+        # Setup Users, Tokens, Projects and Memberships
+        self.user = User.objects.create(username='Tester', password='test1542')
+        self.token = Token.objects.create(user=self.user).key
+        other_user = User.objects.create(username='TestUser1', password='test1542')
+        self.project = Project.objects.create(name="Project1", description="Test Project", owner=other_user)
+        self.hidden_project = Project.objects.create(name="Project2", description="Should not be returned", owner=other_user)
+        self.membership = ProjectMembership.objects.create(owner=self.user, project=self.project, permission_level=ProjectMembership.VIEW)
+
+    def communicator(self, query, scope_type='http'):
+        scope = {
+            'type': scope_type, 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/events/', 'raw_path': b'/events/', 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        return ApplicationCommunicator(asgi_application, scope)
+
+    def test_sse_events(self):
+        """
+        Ensure subscribers receive task changes of their projects until their membership is removed
+        """
+
+        async def subscribe():
+            communicator = self.communicator('projects=%d&token=%s' % (self.project.id, self.token))
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output(5)
+            await communicator.receive_output(5)  # ": subscribed"
+
+            task = await sync_to_async(Task.objects.create)(project=self.project, owner=self.user, name="Pushed Task")
+            created = await communicator.receive_output(5)
+            await sync_to_async(Task.objects.create)(project=self.hidden_project, owner=self.user, name="Hidden Task")
+            await sync_to_async(ProjectMembership.objects.filter(id=self.membership.id).delete)()
+            removed = await communicator.receive_output(5)
+            end = await communicator.receive_output(5)
+            await communicator.wait()
+            return start, task, created['body'].decode(), removed['body'].decode(), end
+
+        start, task, created, removed, end = async_to_sync(subscribe)()
+
+        # Tests
+        self.assertEqual(start['status'], status.HTTP_200_OK)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertTrue(created.startswith('event: task.created\n'))
+        event = json.loads(created.split('data: ', 1)[1])
+        self.assertEqual((event['project'], event['data']['id'], event['data']['name']), (self.project.id, task.id, "Pushed Task"))
+        self.assertTrue(removed.startswith('event: membership.deleted\n'))
+        self.assertEqual(end, {'type': 'http.response.body', 'body': b''})
+
+    def test_subscription_closed_on_lost_access(self):
+        """
+        Ensure subscriptions stop sending projects the user can no longer view, e.g. once queued for purging
+        """
+
+        # Setup Project
+        kept_project = Project.objects.create(name="Project3", description="Still visible", owner=self.user)
+        ProjectMembership.objects.create(owner=self.user, project=kept_project, permission_level=ProjectMembership.SHARE)
+
+        async def subscribe():
+            communicator = self.communicator('projects=%d,%d&token=%s' % (self.project.id, kept_project.id, self.token))
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            await communicator.receive_output(5)
+            await communicator.receive_output(5)  # ": subscribed"
+
+            # Hidden from members, memberships kept until the worker runs
+            await sync_to_async(queue_purge)(self.project, PurgeJob.TRASH_EXPIRED)
+            await asyncio.sleep(0.1)
+            still_subscribed = get_broker().has_subscribers(self.project.id)
+            await sync_to_async(Task.objects.create)(project=kept_project, owner=self.user, name="Kept Task")
+            kept = await communicator.receive_output(5)
+            # Losing the last project ends the stream
+            await sync_to_async(kept_project.delete)()
+            removed = await communicator.receive_output(5)
+            end = await communicator.receive_output(5)
+            await communicator.wait()
+            return still_subscribed, kept['body'].decode(), removed['body'].decode(), end
+
+        still_subscribed, kept, removed, end = async_to_sync(subscribe)()
+
+        # Tests
+        self.assertFalse(still_subscribed)
+        self.assertTrue(kept.startswith('event: task.created\n'))
+        self.assertTrue(removed.startswith('event: membership.deleted\n'))
+        self.assertEqual(end, {'type': 'http.response.body', 'body': b''})
+
+    def test_refused_subscriptions(self):
+        """
+        Ensure subscriptions need a valid token and view permission on every project
+        """
+
+        async def status_of(query):
+            communicator = self.communicator(query)
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output(5)
+            await communicator.receive_output(5)
+            await communicator.wait()
+            return start['status']
+
+        # Tests
+        self.assertEqual(async_to_sync(status_of)('projects=%d' % self.project.id), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(async_to_sync(status_of)('projects=%d&token=wrong' % self.project.id), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(async_to_sync(status_of)('projects=%d,%d&token=%s' % (self.project.id, self.hidden_project.id, self.token)), status.HTTP_403_FORBIDDEN)
+        self.assertEqual(async_to_sync(status_of)('token=%s' % self.token), status.HTTP_400_BAD_REQUEST)
+
+    def test_websocket_events(self):
+        """
+        Ensure the same events are available over a WebSocket
+        """
+
+        async def subscribe():
+            communicator = self.communicator('projects=%d&token=%s' % (self.project.id, self.token), scope_type='websocket')
+            await communicator.send_input({'type': 'websocket.connect'})
+            accepted = await communicator.receive_output(5)
+            await sync_to_async(Task.objects.create)(project=self.project, owner=self.user, name="Pushed Task")
+            message = await communicator.receive_output(5)
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait()
+            return accepted, json.loads(message['text'])
+
+        accepted, event = async_to_sync(subscribe)()
+
+        # Tests
+        self.assertEqual(accepted, {'type': 'websocket.accept'})
+        self.assertEqual((event['type'], event['data']['name']), ('task.created', "Pushed Task"))
+        self.assertFalse(get_broker().has_subscribers(self.project.id))
+
+class ConnectionHealthTests(SimpleTestCase):
+
+    def test_check_connections(self):
+        """
+        Ensure reused connections are pinged lazily, once per request, and closed if they stopped answering
+        """
+
+        # Setup Connections
+        class FakeConnection:
+            def __init__(self, usable, health_checks=True, connected=True, in_atomic_block=False):
+                self.connection = object() if connected else None
+                self.in_atomic_block = in_atomic_block
+                self.settings_dict = {'CONN_HEALTH_CHECKS': health_checks}
+                self.is_usable = mock.Mock(return_value=usable)
+                self.close = mock.Mock()
+                self.ensure_connection = mock.Mock()
+
+        healthy = FakeConnection(True)
+        dropped = FakeConnection(False)
+        unchecked = FakeConnection(False, health_checks=False)
+        not_connected = FakeConnection(False, connected=False)
+        in_transaction = FakeConnection(False, in_atomic_block=True)
+        all_connections = [healthy, dropped, unchecked, not_connected, in_transaction]
+
+        # Request start
+        with mock.patch('rest_api.db.connections') as connections:
+            connections.all.return_value = all_connections
+            check_connections()
+
+        # Tests
+        for connection in all_connections:
+            connection.is_usable.assert_not_called()
+
+        # Queries
+        for connection in all_connections:
+            connection.ensure_connection()
+            connection.ensure_connection()
+
+        # Tests
+        healthy.is_usable.assert_called_once_with()
+        healthy.close.assert_not_called()
+        dropped.is_usable.assert_called_once_with()
+        dropped.close.assert_called_once_with()
+        for connection in (unchecked, not_connected, in_transaction):
+            connection.is_usable.assert_not_called()
+            connection.close.assert_not_called()
+
+class ThrottleTests(SimpleTestCase):
+
+    def make_throttle(self, store, now):
+        # A 10/min user throttle reading the time from now[0]
+        class TestThrottle(UserRateThrottle):
+            rate = '10/min'
+
+            def get_store(self):
+                return store
+
+            def timer(self):
+                return now[0]
+        return TestThrottle()
+
+    def test_sliding_window(self):
+        """
+        Ensure the previous window's requests count in proportion to their overlap
+        """
+
+        # Setup Throttle
+        cache.clear()
+        store = CacheThrottleStore()
+        now = [6000.0]
+        request = mock.Mock(user=mock.Mock(is_authenticated=True, pk=1))
+
+        # Tests
+        allowed = [self.make_throttle(store, now).allow_request(request, None) for i in range(12)]
+        self.assertEqual(allowed, [True] * 10 + [False] * 2)
+
+        # A quarter into the next window three quarters of the last 10 still count
+        now[0] += 75
+        throttle = self.make_throttle(store, now)
+        allowed = [throttle.allow_request(request, None) for i in range(4)]
+        self.assertEqual(allowed, [True, True, False, False])
+        self.assertAlmostEqual(throttle.wait(), 3.0)
+
+        # Other users count separately
+        other_request = mock.Mock(user=mock.Mock(is_authenticated=True, pk=2))
+        self.assertTrue(self.make_throttle(store, now).allow_request(other_request, None))
+
+    def test_shared_store(self):
+        """
+        Ensure concurrent clients of one SQLite store never exceed the rate together
+        """
+
+        # Setup Throttle
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'throttle.sqlite3')
+        now = [6000.0]
+        request = mock.Mock(user=mock.Mock(is_authenticated=True, pk=1))
+        allowed = []
+
+        def worker():
+            # Each thread stands in for a process with its own store
+            throttle = self.make_throttle(SQLiteThrottleStore(path), now)
+            for i in range(10):
+                allowed.append(throttle.allow_request(request, None))
+
+        # Request
+        threads = [threading.Thread(target=worker) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Tests
+        self.assertEqual(allowed.count(True), 10)
+        self.assertEqual(SQLiteThrottleStore(path).get('throttle_user_1:100'), 10)
+
+class PlatformConfigTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache_path = os.path.join(self.directory.name, 'environment.json')
+
+    def write_get_config(self, environment):
+        # Stand-in for /opt/elasticbeanstalk/bin/get-config that counts its calls
+        path = os.path.join(self.directory.name, 'get-config')
+        calls = os.path.join(self.directory.name, 'calls')
+        with open(path, 'w') as script:
+            script.write('#!/bin/sh\necho call >> %s\necho \'%s\'\n' % (calls, json.dumps(environment)))
+        os.chmod(path, stat.S_IRWXU)
+        return path, calls
+
+    def test_stand_in_file(self):
+        """
+        Ensure an explicit config file is used without touching the platform
+        """
+
+        config_file = os.path.join(self.directory.name, 'stand-in.json')
+        with open(config_file, 'w') as stand_in:
+            json.dump({"RDS_HOSTNAME": "db.local"}, stand_in)
+
+        environment = load_environment(config_file=config_file, get_config='/nonexistent', cache_path=self.cache_path)
+
+        self.assertEqual(environment, {"RDS_HOSTNAME": "db.local"})
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_get_config_cached(self):
+        """
+        Ensure get-config runs once and later loads come from the cache file
+        """
+
+        get_config, calls = self.write_get_config({"RDS_HOSTNAME": "db.aws"})
+
+        for i in range(3):
+            environment = load_environment(get_config=get_config, cache_path=self.cache_path)
+            self.assertEqual(environment, {"RDS_HOSTNAME": "db.aws"})
+
+        with open(calls) as call_log:
+            self.assertEqual(len(call_log.readlines()), 1)
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+
+        # Expired cache
+        load_environment(get_config=get_config, cache_path=self.cache_path, ttl=-1)
+        with open(calls) as call_log:
+            self.assertEqual(len(call_log.readlines()), 2)
+
+    def test_off_platform(self):
+        """
+        Ensure a missing get-config yields an empty environment instead of failing
+        """
+
+        environment = load_environment(get_config='/nonexistent/get-config', cache_path=self.cache_path)
+
+        self.assertEqual(environment, {})
@@ -0,0 +1,167 @@
+import functools
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+
+# Request throttling shared by every worker
+#
+# DRF's throttles keep a list of request timestamps per client in the local
+# cache, so each process counts on its own and every check costs time in
+# proportion to the rate. These count requests in a sliding window instead:
+# one atomic counter per client and fixed window, with the previous window's
+# count weighted by how much of it still overlaps the last `duration`
+# seconds. A check is an increment and a read, whatever the rate.
+#
+# Counters live in a store, THROTTLE_STORE picks it. CacheThrottleStore uses
+# a Django cache and is shared across processes when that cache is (Redis or
+# memcached in production). SQLiteThrottleStore shares a local file between
+# the worker processes on one host.
+
+THROTTLE_STORE = getattr(settings, 'THROTTLE_STORE', 'rest_api.throttling.CacheThrottleStore')
+THROTTLE_CACHE = getattr(settings, 'THROTTLE_CACHE', 'default')
+THROTTLE_STORE_PATH = getattr(settings, 'THROTTLE_STORE_PATH', os.path.join(tempfile.gettempdir(), 'project_tracker_server_throttle.sqlite3'))
+
+class BaseThrottleStore(ABC):
+
+    @abstractmethod
+    def incr(self, key, timeout):
+        # Add one to key's counter atomically, creating it with `timeout`, and return the new count
+        ...
+
+    @abstractmethod
+    def decr(self, key):
+        ...
+
+    @abstractmethod
+    def get(self, key):
+        # The counter's value, 0 if missing or expired
+        ...
+
+class CacheThrottleStore(BaseThrottleStore):
+    # Atomic wherever the cache backend's incr is: Redis, memcached, or within one process for local memory
+
+    def __init__(self, alias=THROTTLE_CACHE):
+        self.cache = caches[alias]
+
+    def incr(self, key, timeout):
+        while True:
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # Missing, unless another client created it first
+                if self.cache.add(key, 1, timeout=timeout):
+                    return 1
+
+    def decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+class SQLiteThrottleStore(BaseThrottleStore):
+    # Counters in a SQLite file, shared by the processes on one host
+    CLEANUP_PROBABILITY = 0.001
+
+    def __init__(self, path=THROTTLE_STORE_PATH):
+        self.path = path
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL)')
+            self.local.connection = connection
+        return self.local.connection
+
+    def incr(self, key, timeout):
+        now = time.time()
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if random.random() < self.CLEANUP_PROBABILITY:
+                connection.execute('DELETE FROM counters WHERE expires < ?', (now,))
+            connection.execute(
+                'INSERT INTO counters (key, count, expires) VALUES (?, 1, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'count = CASE WHEN expires < ? THEN 1 ELSE count + 1 END, '
+                'expires = CASE WHEN expires < ? THEN excluded.expires ELSE expires END',
+                (key, now + timeout, now, now))
+            count = connection.execute('SELECT count FROM counters WHERE key = ?', (key,)).fetchone()[0]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return count
+
+    def decr(self, key):
+        self.connection.execute('UPDATE counters SET count = count - 1 WHERE key = ? AND count > 0', (key,))
+
+    def get(self, key):
+        row = self.connection.execute('SELECT count FROM counters WHERE key = ? AND expires >= ?', (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+@functools.lru_cache(maxsize=None)
+def get_store():
+    return import_string(THROTTLE_STORE)()
+
+class SlidingWindowThrottle(throttling.SimpleRateThrottle):
+    # SimpleRateThrottle's rates and cache keys, counted in get_store()
+
+    def get_store(self):
+        return get_store()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        store = self.get_store()
+        now = self.timer()
+        window = int(now // self.duration)
+        current_key = '%s:%d' % (self.key, window)
+        # Both windows must outlive the next one
+        current = store.incr(current_key, timeout=self.duration * 2)
+        previous = store.get('%s:%d' % (self.key, window - 1))
+
+        overlap = 1 - (now - window * self.duration) / self.duration
+        if previous * overlap + current <= self.num_requests:
+            return True
+
+        # Refused requests don't count against the client
+        store.decr(current_key)
+        self.wait_seconds = self.get_wait(now, window, current - 1, previous)
+        return False
+
+    def get_wait(self, now, window, current, previous):
+        # Seconds until the weighted count falls enough for one more request
+        window_end = (window + 1) * self.duration
+        if current >= self.num_requests or previous == 0:
+            return window_end - now
+        # previous * overlap + current + 1 <= num_requests, solved for overlap
+        overlap = (self.num_requests - current - 1) / previous
+        return max(0.0, window_end - overlap * self.duration - now)
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+class AnonRateThrottle(SlidingWindowThrottle, throttling.AnonRateThrottle):
+    pass
+
+class UserRateThrottle(SlidingWindowThrottle, throttling.UserRateThrottle):
+    pass
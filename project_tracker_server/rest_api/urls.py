@@ -12,5 +12,6 @@ router.register(r'projectmemberships', views.ProjectMembershipViewSet)
 router.register(r'tasks', views.TaskViewSet)
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view()),
     path('', include(router.urls)),
 ]
@@ -1,7 +1,22 @@
 from django.http import request
 from rest_api.serializers import ProjectSerializer, ProjectMembershipSerializer, TaskSerializer, UserSerializer
 from rest_api.models import Project, ProjectMembership, Task
-from rest_framework import permissions, viewsets
+from rest_api.acl import get_permission_context, with_user_membership
+from rest_api.pagination import KeysetPaginationMixin, PageNumberCountPagination
+from rest_api.bulk import BulkError, bulk_membership_locations, bulk_tasks
+from rest_api.etags import ConditionalListMixin
+from rest_api.export import CSVRenderer, NDJSONRenderer, export_tasks
+from rest_api.purge import delete_project
+from rest_api.replicas import read_primary
+from rest_api.search import search_tasks, search_users
+from rest_api.stats import combined_stats, task_stats
+from rest_api.sparse import ValuesListMixin
+from rest_api.sync import decode_token, sync
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
 
 import django_filters as filters
@@ -21,12 +36,10 @@ class ProjectFilter(filters.FilterSet):
         parent = super().qs
         if self.request.path == '/projects/':
             # If you're getting list, and not detail
+            # ProjectViewSet already joins the user's membership, so filter on it directly
             if('location' in self.request.query_params.keys()):
-                projects = ProjectMembership.objects.filter(owner=self.request.user, location=self.request.query_params['location'])
-            else:
-                projects = ProjectMembership.objects.filter(owner=self.request.user)
-            
-            return parent.filter(id__in=projects.values_list('project', flat=True))
+                return parent.filter(membership__isnull=False, location=self.request.query_params['location'])
+            return parent.filter(membership__isnull=False)
         return parent
 
     class Meta:
@@ -40,14 +53,18 @@ class ProjectMembershipFilter(filters.FilterSet):
         fields = ['project', 'permission_level', 'location']
 
 class TaskFilter(filters.FilterSet):
+    search = filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        # Ranked full-text search on Postgres, see rest_api/search.py
+        return search_tasks(queryset, value)
 
     @property
     def qs(self):
         parent = super().qs
         if self.request.path == '/tasks/':
             # If you're getting list, and not detail
-            projects = ProjectMembership.objects.filter(owner=self.request.user).values_list('project', flat=True)
-            return parent.filter(project__in=projects)
+            return parent.filter(project__in=get_permission_context(self.request).project_scope())
         return parent
 
     class Meta:
@@ -59,41 +76,59 @@ class TaskFilter(filters.FilterSet):
 class ProjectPermissions(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return ProjectMembership.objects.filter(owner=request.user, project=obj, permission_level__lte=3).exists()
+            return get_permission_context(request).permission_level(obj.id) is not None
 
         # If it's the project owner, or it's a user with at least view permissions
-        return obj.owner == request.user
+        return obj.owner_id == request.user.id
 
 class ProjectMembershipPermissions(permissions.BasePermission):
     def has_permission(self, request, view):
-        if request.method == 'POST':
+        if request.method == 'POST' and view.action == 'create':
             # If it's the project owner, or it's a user with share permissions
-            project = Project.objects.get(id=request.data['project'])
-            return project.owner == request.user or ProjectMembership.objects.filter(owner=request.user, project=project, permission_level__lte=1).exists()
+            return get_permission_context(request).has_level(_project_id(request), ProjectMembership.SHARE)
         return True
     def has_object_permission(self, request, view, obj):
         # Always allow GET, HEAD or OPTIONS requests.
         if request.method in permissions.SAFE_METHODS:
             return True
-            
+
         # If it's the project owner, or it's a user with share permissions and they're not modifying the owner's membership
-        return obj.project.owner == request.user or (ProjectMembership.objects.filter(owner=request.user, project=obj.project, permission_level__lte=1).exists() and not obj.project.owner == obj.owner)
+        context = get_permission_context(request)
+        return context.is_owner(obj.project_id) or (context.has_level(obj.project_id, ProjectMembership.SHARE) and not obj.project.owner_id == obj.owner_id)
 
 class TaskPermissions(permissions.BasePermission):
     def has_permission(self, request, view):
-        if request.method == 'POST':
+        if request.method == 'POST' and view.action == 'create':
             # If it's the project owner, or it's a user with at least edit permissions
-            project = Project.objects.get(id=request.data['project'])
-            return project.owner == request.user or ProjectMembership.objects.filter(owner=request.user, project=project, permission_level__lte=2).exists()
+            return get_permission_context(request).has_level(_project_id(request), ProjectMembership.EDIT)
         return True
 
     def has_object_permission(self, request, view, obj):
         # Always allow GET, HEAD or OPTIONS requests.
         if request.method in permissions.SAFE_METHODS:
-            return obj.project.owner == request.user or ProjectMembership.objects.filter(owner=request.user, project=obj.project, permission_level__lte=3).exists()
+            return get_permission_context(request).has_level(obj.project_id, ProjectMembership.VIEW)
 
         # If it's the project owner, or it's a user with at least edit permissions
-        return obj.project.owner == request.user or ProjectMembership.objects.filter(owner=request.user, project=obj.project, permission_level__lte=2).exists()
+        return get_permission_context(request).has_level(obj.project_id, ProjectMembership.EDIT)
+
+def _project_id(request):
+    # Project targeted by a create request, None if missing or malformed
+    try:
+        return int(request.data['project'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _viewable_project_id(view, request, pk):
+    # TaskPermissions' read rule, checked once for a whole project
+    try:
+        project_id = int(pk)
+    except ValueError:
+        raise NotFound()
+    if not get_permission_context(request).has_level(project_id, ProjectMembership.VIEW):
+        if Project.objects.filter(id=project_id).exists():
+            view.permission_denied(request)
+        raise NotFound()
+    return project_id
 
 # Model Viewsets
 
@@ -102,28 +137,119 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_class = UserFilter
-
-class ProjectViewSet(viewsets.ModelViewSet):
+    search_limit = 10
+    max_search_limit = 25
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # Username prefix matches, optionally leaving out a project's members
+        try:
+            limit = min(int(request.query_params.get('limit', self.search_limit)), self.max_search_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        exclude_project = request.query_params.get('exclude_project')
+        exclude_project_id = None if exclude_project is None else _viewable_project_id(self, request, exclude_project)
+        users = search_users(request.query_params.get('q', ''), max(limit, 0), exclude_project_id)
+        return Response({'results': UserSerializer(users, many=True).data})
+
+class ProjectViewSet(ConditionalListMixin, ValuesListMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated, ProjectPermissions]
     filter_class = ProjectFilter
+    pagination_class = PageNumberCountPagination
+
+    def get_queryset(self):
+        # Projects queued for purging are already gone as far as clients are concerned
+        queryset = super().get_queryset().select_related('owner').filter(purge__isnull=True)
+        return with_user_membership(queryset, self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class ProjectMembershipViewSet(viewsets.ModelViewSet):
-    queryset = ProjectMembership.objects.all()
+    def destroy(self, request, *args, **kwargs):
+        # Large projects are deleted in the background, see rest_api/purge.py
+        job = delete_project(self.get_object())
+        if job is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({'detail': 'Project deletion queued.'}, status=status.HTTP_202_ACCEPTED)
+
+    def get_viewable_project_id(self, request, pk):
+        return _viewable_project_id(self, request, pk)
+
+    @action(detail=True, methods=['get'], url_path='tasks/export', renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, pk=None):
+        # Stream every task in the project
+        return export_tasks(request.accepted_renderer, self.get_viewable_project_id(request, pk))
+
+    @action(detail=True, methods=['get'], url_path='stats')
+    def project_stats(self, request, pk=None):
+        # Task counts by status, priority and category
+        project_id = self.get_viewable_project_id(request, pk)
+        stats = task_stats([project_id])[project_id]
+        stats['project'] = project_id
+        stats.move_to_end('project', last=False)
+        return Response(stats)
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        # Task counts over every project the user can see, optionally in one location
+        location = request.query_params.get('location', '')
+        project_ids = get_permission_context(request).project_ids(int(location) if location.isdigit() else None)
+        stats = task_stats(project_ids)
+        results = combined_stats(stats.values())
+        results['projects'] = [dict(project=project_id, **project) for project_id, project in stats.items()]
+        return Response(results)
+
+class ProjectMembershipViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
+    queryset = ProjectMembership.objects.select_related('project', 'owner')
     serializer_class = ProjectMembershipSerializer
     permission_classes = [permissions.IsAuthenticated, ProjectMembershipPermissions]
-    filter_class = ProjectMembershipFilter        
-
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all()
+    filter_class = ProjectMembershipFilter
+    pagination_class = PageNumberCountPagination
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Move many memberships between locations at once
+        try:
+            response_status, results = bulk_membership_locations(request, request.data)
+        except BulkError as error:
+            raise ValidationError({'detail': str(error)})
+        return Response({'results': results}, status=response_status)
+
+class TaskViewSet(ConditionalListMixin, ValuesListMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
+    queryset = Task.objects.select_related('owner')
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, TaskPermissions]
     filter_class = TaskFilter
+    pagination_class = PageNumberCountPagination
+    cursor_ordering_fields = ('id', 'status', 'priority')
+
+    def get_etag_project_ids(self, request, context):
+        # A single project's board only changes with that project
+        project = request.query_params.get('project', '')
+        if project.isdigit() and int(project) in context.projects:
+            return [int(project)]
+        return super().get_etag_project_ids(request, context)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
-            
\ No newline at end of file
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Create, update and delete many tasks at once
+        try:
+            response_status, results = bulk_tasks(request, request.data)
+        except BulkError as error:
+            raise ValidationError({'detail': str(error)})
+        return Response({'results': results}, status=response_status)
+            
+class SyncView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Everything visible that changed since `?since=`, or everything, a page at a time, when it's missing.
+        # The next token is the primary's clock, a lagging replica would miss changes before it
+        read_primary()
+        since, position = decode_token(request.query_params.get('since'))
+        return Response(sync(request, since, position))